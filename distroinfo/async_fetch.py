@@ -0,0 +1,225 @@
+# Copyright (c) 2019 Red Hat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import copy
+
+from distroinfo import exception
+from distroinfo import fetch
+
+
+class AsyncInfoFetcher(object):
+    """
+    asyncio info fetcher wrapping a blocking InfoFetcher (self.fetcher)
+
+    Blocking file access, HTTP requests and git commands of the wrapped
+    fetcher are run in threads so that event loop is never blocked.
+    Imports are resolved concurrently, at most fetcher.max_workers files
+    are fetched at once if set.
+
+    Derived classes create their blocking counterpart from the same
+    arguments, use fetcher= to wrap an existing (custom) InfoFetcher.
+    Caching and on-disk cache layout is the same as of the wrapped fetcher.
+    """
+    fetcher_class = None
+
+    def __init__(self, *args, **kwargs):
+        fetcher = kwargs.pop('fetcher', None)
+        if not fetcher:
+            fetcher = self.fetcher_class(*args, **kwargs)
+        self.fetcher = fetcher
+
+    @property
+    def source(self):
+        return self.fetcher.source
+
+    @property
+    def cache_path(self):
+        return getattr(self.fetcher, 'cache_path', None)
+
+    async def get_file_content(self, fn):
+        return await asyncio.to_thread(self.fetcher.get_file_content, fn)
+
+    async def get_file_data(self, fn):
+        return await asyncio.to_thread(self.fetcher.get_file_data, fn)
+
+    async def fetch_remote(self, fn, ri, sources=None):
+        ri = ri.copy()
+        ri['info_files'] = '__remote_info__'
+        # this is the same as DistroInfo(**ri)
+        remote_di = self.fetcher.di_class(**ri)
+        return await remote_di.async_fetcher.fetch(fn, sources=sources)
+
+    async def fetch(self, *info_files, **kwargs):
+        """
+        Fetch info files and their imports concurrently.
+
+        Returns the same contents as InfoFetcher.fetch().
+        """
+        remote_info = kwargs.get('remote_info', {})
+        sources = kwargs.get('sources')
+        resolver = _AsyncImportResolver(self)
+        try:
+            nodes = resolver.submit(
+                info_files, frozenset(self.fetcher.fetching), remote_info)
+            contents = []
+            await resolver.collect(nodes, remote_info, contents, sources)
+        except BaseException:
+            await resolver.cancel()
+            raise
+        return contents
+
+
+class AsyncLocalInfoFetcher(AsyncInfoFetcher):
+    """Fetch info files from local directory (source)"""
+    fetcher_class = fetch.LocalInfoFetcher
+
+
+class AsyncRemoteInfoFetcher(AsyncInfoFetcher):
+    """
+    Fetch remote info files from URL (source)
+
+    See RemoteInfoFetcher
+    """
+    fetcher_class = fetch.RemoteInfoFetcher
+
+
+class AsyncRemoteGitInfoFetcher(AsyncInfoFetcher):
+    """
+    Fetch info files from a remote git repo (source)
+
+    See RemoteGitInfoFetcher
+    """
+    fetcher_class = fetch.RemoteGitInfoFetcher
+
+    async def fetch(self, *info_files, **kwargs):
+        # sync the repo once instead of in each concurrent file load
+        await asyncio.to_thread(self.fetcher.sync)
+        return await super(AsyncRemoteGitInfoFetcher, self).fetch(
+            *info_files, **kwargs)
+
+    async def get_file_data(self, fn):
+        await asyncio.to_thread(self.fetcher.sync, False)
+        return await super(AsyncRemoteGitInfoFetcher, self).get_file_data(fn)
+
+
+def get_async_fetcher(fetcher):
+    """
+    Return AsyncInfoFetcher wrapping supplied InfoFetcher.
+    """
+    for async_class in (AsyncRemoteGitInfoFetcher,
+                        AsyncRemoteInfoFetcher,
+                        AsyncLocalInfoFetcher):
+        if type(fetcher) is async_class.fetcher_class:
+            return async_class(fetcher=fetcher)
+    return AsyncInfoFetcher(fetcher=fetcher)
+
+
+class _AsyncImportResolver(object):
+    """
+    Resolve import graph of an AsyncInfoFetcher using asyncio tasks.
+
+    asyncio counterpart of fetch._ImportResolver.
+    """
+    def __init__(self, async_fetcher):
+        self.async_fetcher = async_fetcher
+        self.fetcher = async_fetcher.fetcher
+        self.tasks = []
+        self.loaded = {}
+        self.semaphore = None
+        if self.fetcher.max_workers:
+            self.semaphore = asyncio.Semaphore(self.fetcher.max_workers)
+
+    def create_task(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks.append(task)
+        return task
+
+    async def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def submit(self, info_files, ancestors, remotes):
+        nodes = []
+        for ifn in info_files:
+            node = fetch._ImportNode(ifn, ancestors, remotes)
+            if isinstance(ifn, dict):
+                remote = next(iter(ifn))
+                node.remote = remote
+                ri = remotes.get(remote)
+                if ri:
+                    node.remote_conf = ri
+                    node.future = self.create_task(
+                        self.async_fetcher.fetch_remote(
+                            ifn[remote], ri, sources=node.sources))
+            else:
+                node.future = self.create_task(self.load(node))
+            nodes.append(node)
+        return nodes
+
+    async def load(self, node):
+        if node.ifn in node.ancestors:
+            raise exception.CircularInfoInclude(info=node.ifn)
+        info = await self.get_file_data_once(node.ifn)
+        imports = info.get('import', [])
+        if self.fetcher.allow_import and imports:
+            remotes = node.remotes
+            new_remotes = info.get('remote-info', {})
+            if new_remotes:
+                remotes = dict(remotes)
+                remotes.update(new_remotes)
+            node.children = self.submit(
+                imports, node.ancestors | {node.ifn}, remotes)
+        return info
+
+    async def get_file_data(self, fn):
+        if self.semaphore:
+            async with self.semaphore:
+                return await self.async_fetcher.get_file_data(fn)
+        return await self.async_fetcher.get_file_data(fn)
+
+    async def get_file_data_once(self, fn):
+        # a file imported multiple times is only fetched and loaded once,
+        # following imports get a copy as merge_infos() modifies infos
+        task = self.loaded.get(fn)
+        if task is None:
+            task = self.loaded[fn] = self.create_task(self.get_file_data(fn))
+            return await task
+        return copy.deepcopy(await task)
+
+    async def collect(self, nodes, remote_info, contents, sources=None):
+        for node in nodes:
+            if node.remote:
+                ri = remote_info.get(node.remote)
+                if not ri:
+                    raise exception.InvalidRemoteInfoRef(remote=node.remote)
+                if node.future and node.remote_conf == ri:
+                    contents += await node.future
+                    if sources is not None:
+                        sources += node.sources
+                else:
+                    # remote-info was (re)defined outside of import path
+                    contents += await self.async_fetcher.fetch_remote(
+                        node.ifn[node.remote], ri, sources=sources)
+            else:
+                info = await node.future
+                contents.append(info)
+                if sources is not None:
+                    sources.append((self.fetcher, node.ifn))
+                remotes = info.get('remote-info', {})
+                if remotes:
+                    remote_info.update(remotes)
+                await self.collect(node.children, remote_info, contents,
+                                   sources)
@@ -30,6 +30,10 @@ class InfoFetcherRequired(DistroInfoException):
     msg_fmt = "No info fetcher was selected."
 
 
+class GitInfoFetcherRequired(DistroInfoException):
+    msg_fmt = "Git info fetcher (remote_git_info) is required to %(what)s."
+
+
 class InvalidInfoFormat(DistroInfoException):
     msg_fmt = "Invalid info format."
 
@@ -54,6 +58,30 @@ class DuplicatedProject(InvalidInfoFormat):
     msg_fmt = "Duplicated project: %(prj)s"
 
 
+class DuplicatedPackage(InvalidInfoFormat):
+    msg_fmt = "Duplicated package name: %(name)s"
+
+
+class InfoValidationFailed(InvalidInfoFormat):
+    msg_fmt = "Info validation failed with %(count)d error(s):\n%(errors)s"
+
+    def __init__(self, msg=None, errors=None, **kwargs):
+        self.errors = errors or []
+        kwargs['count'] = len(self.errors)
+        kwargs['errors'] = "\n".join(str(e) for e in self.errors)
+        super(InfoValidationFailed, self).__init__(msg, **kwargs)
+
+
+class SchemaViolation(InvalidInfoFormat):
+    msg_fmt = "%(path)s: %(why)s"
+
+    def __init__(self, msg=None, path=None, why=None, **kwargs):
+        self.path = path
+        self.why = why
+        super(SchemaViolation, self).__init__(
+            msg, path=path, why=why, **kwargs)
+
+
 class CircularInfoInclude(InvalidInfoFormat):
     msg_fmt = "Circular info include: %(info)s"
 
@@ -12,15 +12,25 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+from concurrent import futures
+import copy
 import hashlib
+import io
+import json
 import logging
 import os
+import pickle
+import re
 import requests
+import threading
+import time
 import yaml
 try:
     from yaml import CLoader as Loader
 except ImportError:
     from yaml import Loader
+from yaml.composer import Composer
 
 from distroinfo import exception
 from distroinfo import helpers
@@ -37,6 +47,126 @@ def get_id(s, postfix=False):
     return h
 
 
+class ContentCache(object):
+    """
+    Process-wide LRU cache of loaded info file data shared by all fetchers.
+
+    Data are stored pickled so that each get() returns a new copy and
+    the total size of stored data is kept under max_size bytes by evicting
+    least recently used entries. Set max_size to 0 to disable the cache.
+    """
+    def __init__(self, max_size=64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            blob = self.entries.get(key)
+            if blob is None:
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(blob)
+
+    def set(self, key, data):
+        if not self.max_size:
+            return
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_size:
+            return
+        with self.lock:
+            old_blob = self.entries.pop(key, None)
+            if old_blob is not None:
+                self.size -= len(old_blob)
+            self.entries[key] = blob
+            self.size += len(blob)
+            while self.size > self.max_size:
+                _, old_blob = self.entries.popitem(last=False)
+                self.size -= len(old_blob)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+content_cache = ContentCache()
+
+
+def get_stat_version(path):
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+_refresh_pool = None
+_refresh_pool_lock = threading.Lock()
+
+
+def _get_refresh_pool():
+    # shared pool running background cache refreshes
+    global _refresh_pool
+    with _refresh_pool_lock:
+        if _refresh_pool is None:
+            _refresh_pool = futures.ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix='distroinfo-refresh')
+        return _refresh_pool
+
+
+class StreamLoader(Loader, Composer):
+    """
+    YAML Loader able to compose nodes one by one from parser events
+    """
+    def __init__(self, stream):
+        Loader.__init__(self, stream)
+        Composer.__init__(self)
+
+    def load_node(self):
+        return self.construct_document(self.compose_node(None, None))
+
+
+def iter_yaml_items(stream, stream_key='packages'):
+    """
+    Iterate over top level items of YAML mapping document without
+    loading it whole.
+
+    Yields (key, value) tuples of top level items except for stream_key
+    collection (list or dict) which is yielded item by item as
+    (stream_key, item) tuples so that memory use doesn't depend on its
+    size.
+    """
+    loader = StreamLoader(stream)
+    try:
+        loader.get_event()
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise exception.InvalidInfoFormat(
+                msg="info file must contain a mapping")
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = loader.load_node()
+            if key != stream_key:
+                yield key, loader.load_node()
+                continue
+            if loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield key, loader.load_node()
+            elif loader.check_event(yaml.MappingStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.MappingEndEvent):
+                    loader.load_node()
+                    yield key, loader.load_node()
+            else:
+                raise exception.InvalidInfoFormat(
+                    msg="'%s' section must be iterable" % key)
+            loader.get_event()
+    finally:
+        loader.dispose()
+
+
 class InfoFetcher(object):
     """
     Abstract class to derive simple info fetchers from.
@@ -44,10 +174,22 @@ class InfoFetcher(object):
     Implement get_file_content() to return info file contents.
 
     See CachedInfoFetcher if you also need caching.
+
+    Implement get_file_version() to use process-wide content_cache of
+    loaded file data shared by all fetchers.
+
+    Pass a list as sources= to fetch() to collect (fetcher, file) tuples of
+    all fetched files which can be used to compute get_fingerprint() of
+    fetched sources later.
+
+    Set max_workers > 1 to fetch and load imports concurrently using a pool
+    of max_workers threads. Resulting contents are the same as with
+    sequential fetch, get_file_content() needs to be thread safe.
     """
-    def __init__(self, source, allow_import=True):
+    def __init__(self, source, allow_import=True, max_workers=None):
         self.source = source
         self.allow_import = allow_import
+        self.max_workers = max_workers
         self.fetching = set()
         # DistroInfo will set this to DistroInfo class in order to allow
         # recursive fetch without circular dependency.
@@ -56,13 +198,75 @@ class InfoFetcher(object):
     def get_file_content(self, fn):
         raise NotImplementedError()
 
+    def get_file_version(self, fn):
+        """
+        Return a cheaply obtained version of current file contents
+        (such as mtime or commit) or None if it isn't available.
+        """
+        return None
+
     def get_file_data(self, fn):
+        version = self.get_file_version(fn)
+        if version is None:
+            return self.load_file_data(fn)
+        key = (self.source, fn, version)
+        data = content_cache.get(key)
+        if data is None:
+            data = self.load_file_data(fn)
+            content_cache.set(key, data)
+        return data
+
+    def load_file_data(self, fn):
         content = self.get_file_content(fn)
         return yaml.load(content, Loader=Loader)
 
+    def open_file(self, fn):
+        """
+        Return file object of info file for streaming.
+
+        Override this when info file can be read without loading it whole.
+        """
+        return io.StringIO(self.get_file_content(fn))
+
+    def iter_file_items(self, fn, stream_key='packages'):
+        """
+        Stream top level items of info file, see iter_yaml_items()
+        """
+        with self.open_file(fn) as stream:
+            for item in iter_yaml_items(stream, stream_key=stream_key):
+                yield item
+
+    def get_fingerprint(self, files):
+        """
+        Return a fingerprint of current contents of supplied info files.
+
+        Override this when a cheaper way is available.
+        """
+        h = hashlib.sha1()
+        for fn in files:
+            h.update(fn.encode('utf-8'))
+            h.update(self.get_file_content(fn).encode('utf-8'))
+        return h.hexdigest()
+
+    def get_file_fingerprint(self, fn):
+        """
+        Return a fingerprint of current contents of a single info file.
+        """
+        return self.get_fingerprint([fn])
+
+    def fetch_remote(self, fn, ri, sources=None):
+        ri = ri.copy()
+        ri['info_files'] = '__remote_info__'
+        # this is the same as DistroInfo(**ri)
+        remote_di = self.di_class(**ri)
+        return remote_di.fetcher.fetch(fn, sources=sources)
+
     def fetch(self, *info_files, **kwargs):
+        if self.max_workers and self.max_workers > 1:
+            return self.fetch_concurrent(*info_files, **kwargs)
         contents = []
         remote_info = kwargs.get('remote_info', {})
+        sources = kwargs.get('sources')
         for ifn in info_files:
             if isinstance(ifn, dict):
                 # fetch remote info using a new DistroInfo instance
@@ -71,18 +275,15 @@ class InfoFetcher(object):
                 ri = remote_info.get(remote)
                 if not ri:
                     raise exception.InvalidRemoteInfoRef(remote=remote)
-                ri = ri.copy()
-                ri['info_files'] = '__remote_info__'
-                # this is the same as DistroInfo(**ri)
-                remote_di = self.di_class(**ri)
-                remote_contents = remote_di.fetcher.fetch(fn)
-                contents += remote_contents
+                contents += self.fetch_remote(fn, ri, sources=sources)
             else:
                 # import within this info repo
                 if ifn in self.fetching:
                     raise exception.CircularInfoInclude(info=ifn)
                 info = self.get_file_data(ifn)
                 contents.append(info)
+                if sources is not None:
+                    sources.append((self, ifn))
                 # collect remote-infos
                 remotes = info.get('remote-info', {})
                 if remotes:
@@ -93,30 +294,235 @@ class InfoFetcher(object):
                     self.fetching.add(ifn)
                     try:
                         contents += self.fetch(*imports,
-                                               remote_info=remote_info)
+                                               remote_info=remote_info,
+                                               sources=sources)
                     finally:
                         self.fetching.remove(ifn)
         return contents
 
+    def fetch_concurrent(self, *info_files, **kwargs):
+        """
+        Fetch info files and their imports using a pool of worker threads.
+
+        Sibling imports are fetched and loaded in parallel as soon as their
+        parent is loaded while the results are collected in the same order
+        as sequential fetch() would produce, raising the same errors.
+        """
+        remote_info = kwargs.get('remote_info', {})
+        sources = kwargs.get('sources')
+        pool = futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        resolver = _ImportResolver(self, pool)
+        try:
+            nodes = resolver.submit(
+                info_files, frozenset(self.fetching), remote_info)
+            contents = []
+            resolver.collect(nodes, remote_info, contents, sources)
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown(wait=True)
+        return contents
+
+
+class _ImportNode(object):
+    """
+    A single entry of the import graph as resolved by concurrent fetch.
+
+    File nodes are loaded by a pool worker which also creates their child
+    nodes. Remote nodes might carry a speculative fetch of a remote info
+    started with the remote-info definitions known along the import path.
+    """
+    def __init__(self, ifn, ancestors, remotes):
+        self.ifn = ifn
+        self.ancestors = ancestors
+        self.remotes = remotes
+        self.children = []
+        self.sources = []
+        self.remote = None
+        self.remote_conf = None
+        self.future = None
+
+
+class _ImportResolver(object):
+    """
+    Resolve import graph of an InfoFetcher using a thread pool.
+
+    submit() schedules loading of info files, each loaded file schedules
+    its own imports. collect() then walks the resulting tree in the order
+    of sequential InfoFetcher.fetch() waiting for individual results.
+    """
+    def __init__(self, fetcher, pool):
+        self.fetcher = fetcher
+        self.pool = pool
+        self.loaded = {}
+        self.loaded_lock = threading.Lock()
+
+    def submit(self, info_files, ancestors, remotes):
+        nodes = []
+        for ifn in info_files:
+            node = _ImportNode(ifn, ancestors, remotes)
+            if isinstance(ifn, dict):
+                remote = next(iter(ifn))
+                node.remote = remote
+                ri = remotes.get(remote)
+                if ri:
+                    # remote-info defined along the import path is most
+                    # likely the one to be used, start fetching early
+                    node.remote_conf = ri
+                    node.future = self.pool.submit(
+                        self.fetcher.fetch_remote, ifn[remote], ri,
+                        sources=node.sources)
+            else:
+                node.future = self.pool.submit(self.load, node)
+            nodes.append(node)
+        return nodes
+
+    def load(self, node):
+        if node.ifn in node.ancestors:
+            raise exception.CircularInfoInclude(info=node.ifn)
+        info = self.get_file_data_once(node.ifn)
+        imports = info.get('import', [])
+        if self.fetcher.allow_import and imports:
+            remotes = node.remotes
+            new_remotes = info.get('remote-info', {})
+            if new_remotes:
+                remotes = dict(remotes)
+                remotes.update(new_remotes)
+            node.children = self.submit(
+                imports, node.ancestors | {node.ifn}, remotes)
+        return info
+
+    def get_file_data_once(self, fn):
+        # a file imported multiple times is only fetched and loaded once,
+        # following imports get a copy as merge_infos() modifies infos
+        with self.loaded_lock:
+            entry = self.loaded.get(fn)
+            if entry is None:
+                entry = self.loaded[fn] = [threading.Lock(), None]
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = self.fetcher.get_file_data(fn)
+                return entry[1]
+        return copy.deepcopy(entry[1])
+
+    def collect(self, nodes, remote_info, contents, sources=None):
+        for node in nodes:
+            if node.remote:
+                ri = remote_info.get(node.remote)
+                if not ri:
+                    raise exception.InvalidRemoteInfoRef(remote=node.remote)
+                if node.future and node.remote_conf == ri:
+                    contents += node.future.result()
+                    if sources is not None:
+                        sources += node.sources
+                else:
+                    # remote-info was (re)defined outside of import path
+                    contents += self.fetcher.fetch_remote(
+                        node.ifn[node.remote], ri, sources=sources)
+            else:
+                info = node.future.result()
+                contents.append(info)
+                if sources is not None:
+                    sources.append((self.fetcher, node.ifn))
+                remotes = info.get('remote-info', {})
+                if remotes:
+                    remote_info.update(remotes)
+                self.collect(node.children, remote_info, contents, sources)
+
 
 class CachedInfoFetcher(InfoFetcher):
     """
     Abstract class to derive caching info fetchers from.
 
-    Implement get_file_content() to return info file contents.
+    Implement get_file_content() to return info file contents and provide
+    self.cache_path.
 
     Only cache if self.cache_ttl > 0.
+
+    Loaded file data are also cached in pickle format in data_cache_path
+    along with a hash of file contents so that YAML parsing is skipped
+    for unchanged files. Disable with cache_data=False.
+
+    Set cache_max_age > cache_ttl to use stale-while-revalidate policy:
+    cache older than cache_ttl but not older than cache_max_age is used
+    immediately and refreshed in background using refresh_in_background().
+    Use wait_for_refresh() to wait for outstanding refreshes.
     """
+    data_cache_version = 1
+
     def __init__(self, *args, **kwargs):
         self.cache_ttl = kwargs.pop('cache_ttl', 0)
+        self.cache_max_age = kwargs.pop('cache_max_age', None)
         self.cache_base_path = kwargs.pop('cache_base_path', None)
+        self.cache_data = kwargs.pop('cache_data', True)
         if not self.cache_base_path:
             self.cache_base_path = helpers.get_default_cache_base_path()
         super(CachedInfoFetcher, self).__init__(*args, **kwargs)
+        self.refreshes = {}
+        self.refreshes_lock = threading.Lock()
 
     def get_file_content(self, fn):
         raise NotImplementedError()
 
+    def is_stale(self, age):
+        """
+        Return True if cache of supplied age should be used and refreshed
+        in background.
+        """
+        if not self.cache_ttl or not self.cache_max_age:
+            return False
+        return self.cache_ttl < age <= self.cache_max_age
+
+    def refresh_in_background(self, key, refresh, *args):
+        """
+        Run refresh(*args) in background unless refresh of key is running.
+        """
+        with self.refreshes_lock:
+            future = self.refreshes.get(key)
+            if future and not future.done():
+                return
+            self.refreshes[key] = _get_refresh_pool().submit(
+                self._refresh, key, refresh, *args)
+
+    def _refresh(self, key, refresh, *args):
+        try:
+            refresh(*args)
+        except Exception as e:
+            log.warning(u"Background refresh of %s failed: %s" % (key, e))
+
+    def wait_for_refresh(self, timeout=None):
+        """
+        Wait for outstanding background refreshes to finish.
+        """
+        with self.refreshes_lock:
+            pending = list(self.refreshes.values())
+        futures.wait(pending, timeout=timeout)
+
+    @property
+    def data_cache_path(self):
+        return self.cache_path + '.data'
+
+    def load_file_data(self, fn):
+        content = self.get_file_content(fn)
+        if not self.cache_ttl or not self.cache_data:
+            return yaml.load(content, Loader=Loader)
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        path = os.path.join(self.data_cache_path, fn + '.pickle')
+        try:
+            with open(path, 'rb') as f:
+                key, data = pickle.load(f)
+            if key == (self.data_cache_version, digest):
+                log.debug(u'Using cached data of %s' % fn)
+                return data
+        except Exception:
+            # missing or invalid data cache, load file again
+            pass
+        data = yaml.load(content, Loader=Loader)
+        helpers.write_file_atomic(path, pickle.dumps(
+            ((self.data_cache_version, digest), data),
+            protocol=pickle.HIGHEST_PROTOCOL))
+        return data
+
 
 class LocalInfoFetcher(InfoFetcher):
     """Fetch info files from local directory (source)"""
@@ -124,51 +530,154 @@ class LocalInfoFetcher(InfoFetcher):
         fn = os.path.join(self.source, fn)
         return open(fn).read()
 
+    def open_file(self, fn):
+        return open(os.path.join(self.source, fn))
+
+    def get_file_version(self, fn):
+        try:
+            return get_stat_version(
+                os.path.abspath(os.path.join(self.source, fn)))
+        except OSError:
+            return None
+
+    def get_fingerprint(self, files):
+        stats = []
+        for fn in files:
+            st = os.stat(os.path.join(self.source, fn))
+            stats.append((fn, st.st_mtime_ns, st.st_size))
+        return tuple(stats)
+
 
 class RemoteInfoFetcher(CachedInfoFetcher):
     """
     Fetch remote info files from URL (source)
 
     Cache info files locally if self.cache_ttl > 0
+
+    ETag and Last-Modified headers of cached files are stored next to them
+    (.meta suffix) and used to revalidate expired files using conditional
+    requests so that unchanged files aren't downloaded again.
+
+    Cached files are replaced atomically and only one process (or thread)
+    refreshes an expired file at a time while others wait for it using
+    a lock file (.lock suffix) so that cache can be shared.
     """
+    meta_suffix = '.meta'
+    lock_suffix = '.lock'
+
     def __init__(self, *args, **kwargs):
         super(RemoteInfoFetcher, self).__init__(*args, **kwargs)
         self.cache_path = os.path.join(
             self.cache_base_path, get_id(self.source))
+        # reuse connections to the same host across files
+        self.session = requests.Session()
+        if self.max_workers and self.max_workers > 10:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_maxsize=self.max_workers)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    def get_cache_meta(self, path):
+        try:
+            with open(path + self.meta_suffix, 'rt') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def set_cache_meta(self, path, headers):
+        meta = {}
+        for header in ('ETag', 'Last-Modified'):
+            val = headers.get(header)
+            if val:
+                meta[header] = val
+        meta_path = path + self.meta_suffix
+        if meta:
+            helpers.write_file_atomic(meta_path, json.dumps(meta))
+        elif os.path.exists(meta_path):
+            os.remove(meta_path)
 
-    def fetch_file(self, fn):
+    def fetch_file(self, fn, revalidate=False):
         url = u'%s%s' % (self.source, fn)
+        path = os.path.join(self.cache_path, fn)
+        headers = {}
+        if revalidate:
+            meta = self.get_cache_meta(path)
+            if 'ETag' in meta:
+                headers['If-None-Match'] = meta['ETag']
+            if 'Last-Modified' in meta:
+                headers['If-Modified-Since'] = meta['Last-Modified']
         log.info(u'Fetching remote file: %s' % url)
-        req = requests.get(url)
+        req = self.session.get(url, headers=headers)
+        if req.status_code == 304 and headers:
+            # cached file is still valid, refresh its age
+            log.info(u'Remote file not modified, using cached version of %s'
+                     % fn)
+            os.utime(path, None)
+            return open(path, 'rt').read()
         if req.ok:
             if self.cache_ttl:
                 # cache this file
-                path = os.path.join(self.cache_path, fn)
-                base_dir = os.path.dirname(path)
-                helpers.ensure_dir(base_dir)
-                with open(path, 'wt') as f:
-                    f.write(req.text)
+                helpers.write_file_atomic(path, req.text)
+                self.set_cache_meta(path, req.headers)
             return req.text
         else:
             raise exception.RemoteFetchError(
                 code=req.status_code, reason=req.reason, url=url)
 
-    def get_file_content(self, fn):
+    def get_cached_file_content(self, fn, stale=False):
+        """
+        Return cached file contents if it's fresh enough, None otherwise.
+
+        With stale=True, also return stale file contents and refresh it
+        in background.
+        """
         path = os.path.join(self.cache_path, fn)
-        fetch = True
-        if self.cache_ttl and os.path.exists(path):
-            # look for cache first
-            age = helpers.get_file_age(path)
-            if age <= self.cache_ttl:
-                # use cached version
-                fetch = False
-                log.info(u'Using %d s old cached version of %s' % (age, fn))
-        if fetch:
-            text = self.fetch_file(fn)
-        else:
+        if not os.path.exists(path):
+            return None
+        age = helpers.get_file_age(path)
+        if age > self.cache_ttl:
+            if not stale or not self.is_stale(age):
+                return None
+            log.info(u'Using %d s old stale cached version of %s, '
+                     u'refreshing in background' % (age, fn))
+            # read the file before the refresh can replace it
             text = open(path, 'rt').read()
+            self.refresh_in_background(fn, self.refresh_file, fn)
+            return text
+        log.info(u'Using %d s old cached version of %s' % (age, fn))
+        return open(path, 'rt').read()
+
+    def refresh_file(self, fn):
+        path = os.path.join(self.cache_path, fn)
+        with helpers.file_lock(path + self.lock_suffix):
+            # file might have been refreshed while waiting for the lock
+            text = self.get_cached_file_content(fn)
+            if text is None:
+                text = self.fetch_file(fn, revalidate=os.path.exists(path))
         return text
 
+    def get_file_version(self, fn):
+        # only fresh cached files can be used without fetching
+        if not self.cache_ttl:
+            return None
+        path = os.path.join(self.cache_path, fn)
+        try:
+            version = get_stat_version(path)
+        except OSError:
+            return None
+        if helpers.get_file_age(path) > self.cache_ttl:
+            return None
+        return version
+
+    def get_file_content(self, fn):
+        if not self.cache_ttl:
+            return self.fetch_file(fn)
+        # look for cache first
+        text = self.get_cached_file_content(fn, stale=True)
+        if text is not None:
+            return text
+        return self.refresh_file(fn)
+
 
 class RemoteGitInfoFetcher(CachedInfoFetcher):
     """
@@ -177,23 +686,188 @@ class RemoteGitInfoFetcher(CachedInfoFetcher):
     Use git clone to get the repository.
 
     Only sync the repo if local copy is older than self.cache_ttl
+
+    Use checkout=False to read files straight from git objects without
+    a worktree, optionally from a specific revision (ref or commit SHA).
+    Revision is resolved to a commit once on first read so that all files
+    are consistent, bare branch names resolve to origin/<branch>. When
+    revision is a commit SHA already present in local clone, no fetch is
+    done.
+
+    Use clone_depth, clone_filter and sparse to limit the amount of data
+    cloned and fetched, see GitRepoManager. With sparse=True, only
+    requested info files are checked out.
+
+    With cache_max_age and checkout=False, a stale repo is fetched in
+    background while files are already being read from the synced commit.
+    A worktree is always synced before reading as checking it out in
+    background would change files being read.
+
+    Without a worktree, file versions are blob SHAs so that loaded data of
+    files unchanged between revisions are shared through content_cache.
+    Use for_revision() to read another revision of the same repo.
+
+    The repo is synced on each fetch() and get_fingerprint() when last
+    sync is older than cache_ttl, files are read from the last synced
+    state in between.
     """
     def __init__(self, *args, **kwargs):
+        self.init_args = (args, dict(kwargs))
+        self.revision = kwargs.pop('revision', None)
+        self.checkout = kwargs.pop('checkout', True) and not self.revision
+        clone_depth = kwargs.pop('clone_depth', None)
+        clone_filter = kwargs.pop('clone_filter', None)
+        sparse = kwargs.pop('sparse', False)
         super(RemoteGitInfoFetcher, self).__init__(*args, **kwargs)
         self.repo = repoman.GitRepoManager(
             url=self.source,
             ttl=self.cache_ttl,
             base_path=self.cache_base_path,
-            repo_dir_postfix=get_id(self.source, postfix=True))
-        self.synced = False
+            repo_dir_postfix=get_id(self.source, postfix=True),
+            checkout=self.checkout,
+            depth=clone_depth,
+            clone_filter=clone_filter,
+            sparse=sparse)
+        self.synced_at = None
+        self.pinned = False
+        self.sync_lock = threading.Lock()
+        self.commit = None
+        self.tree = None
+        self.blob_reader = None
+        self.shared_data = None
+
+    def for_revision(self, revision, shared_data=None):
+        """
+        Return a new fetcher of the same repo reading files of supplied
+        revision without a worktree.
+
+        :param shared_data: dict to share loaded file data with other
+                            fetchers of the same repo, such data are
+                            returned without copying and mustn't be
+                            modified
+        """
+        args, kwargs = self.init_args
+        kwargs = dict(kwargs, revision=revision, checkout=False)
+        fetcher = type(self)(*args, **kwargs)
+        fetcher.di_class = self.di_class
+        fetcher.shared_data = shared_data
+        return fetcher
+
+    def sync(self, expire=True):
+        """
+        Sync the repo unless it was synced less than cache_ttl ago.
+
+        :param expire: set to False to only sync when not synced yet
+        """
+        with self.sync_lock:
+            if self.synced_at is not None:
+                if not expire or self.pinned:
+                    return
+                if time.time() - self.synced_at < self.cache_ttl:
+                    return
+            if self.checkout:
+                self.sync_repo()
+            else:
+                commit = self.get_pinned_commit()
+                # pinned commit never changes, no need to sync again
+                self.pinned = bool(commit)
+                if not commit:
+                    self.sync_repo()
+                    commit = self.resolve_revision()
+                if commit != self.commit:
+                    self.tree = self.repo.get_tree(commit)
+                    self.commit = commit
+                if not self.blob_reader:
+                    self.blob_reader = repoman.GitBlobReader(
+                        self.repo.repo_path)
+            self.synced_at = time.time()
+
+    def fetch(self, *info_files, **kwargs):
+        if not self.fetching:
+            # sync once per fetch, imports are read from the same state
+            self.sync()
+        return super(RemoteGitInfoFetcher, self).fetch(*info_files,
+                                                       **kwargs)
+
+    def sync_repo(self):
+        # only objects are fetched in background, never the worktree
+        if not self.checkout and os.path.isdir(self.repo.repo_path):
+            t_fetch = self.repo.get_last_fetch_time()
+            if t_fetch and self.is_stale(time.time() - t_fetch):
+                log.info(u"Using stale %s repo, refreshing in background: %s"
+                         % (self.repo.repo_desc, self.repo.repo_path))
+                self.refresh_in_background(self.source, self.repo.sync)
+                return
+        self.repo.sync()
+
+    def resolve_revision(self):
+        """
+        Return commit SHA of self.revision in synced repo.
+
+        Bare branch names such as master refer to remote branches as
+        local branches of the clone aren't updated by fetching.
+        """
+        revision = self.revision or 'master'
+        try:
+            return self.repo.get_commit('origin/%s' % revision)
+        except exception.CommandFailed:
+            return self.repo.get_commit(revision)
+
+    def get_pinned_commit(self):
+        # exact commit available locally doesn't need to be fetched
+        if not self.revision or not re.match(r'^[0-9a-f]{40}$',
+                                             self.revision):
+            return None
+        if not os.path.isdir(self.repo.repo_path):
+            return None
+        try:
+            return self.repo.get_commit(self.revision)
+        except exception.CommandFailed:
+            return None
 
     def get_file_content(self, fn):
-        if not self.synced:
-            self.repo.sync()
-            self.synced = True
+        self.sync(expire=False)
+        if not self.checkout:
+            return self.blob_reader.read(self.commit, fn).decode('utf-8')
+        self.repo.add_sparse_path(fn)
         path = self.repo.get_file_path(fn)
         return open(path).read()
 
+    def get_file_data(self, fn):
+        if self.shared_data is None:
+            return super(RemoteGitInfoFetcher, self).get_file_data(fn)
+        version = self.get_file_version(fn)
+        data = self.shared_data.get((fn, version))
+        if data is None:
+            data = super(RemoteGitInfoFetcher, self).get_file_data(fn)
+            if version is not None:
+                self.shared_data[(fn, version)] = data
+        return data
+
+    def get_file_version(self, fn):
+        self.sync(expire=False)
+        if not self.checkout:
+            return self.tree.get(fn)
+        try:
+            return get_stat_version(self.repo.get_file_path(fn))
+        except OSError:
+            return None
+
+    def get_fingerprint(self, files):
+        self.sync()
+        if not self.checkout:
+            return self.commit
+        return self.repo.get_head()
+
+    def get_file_fingerprint(self, fn):
+        # commit changes with any file, use contents
+        self.sync(expire=False)
+        return InfoFetcher.get_fingerprint(self, [fn])
+
+    def close(self):
+        if self.blob_reader:
+            self.blob_reader.close()
+
     @property
     def cache_path(self):
         return self.repo.repo_path
@@ -15,7 +15,12 @@
 import contextlib
 import os
 import subprocess
+import tempfile
 import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 from distroinfo import exception
 
@@ -38,6 +43,47 @@ def ensure_dir(path):
         os.makedirs(path)
 
 
+def write_file_atomic(path, data):
+    """
+    Write data (text or bytes) to file so that readers never see
+    a partially written file.
+
+    Data are written into a temporary file which then replaces path.
+    """
+    base_dir = os.path.dirname(path)
+    ensure_dir(base_dir)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=base_dir, prefix='.%s.' % os.path.basename(path), suffix='.tmp')
+    mode = 'wb' if isinstance(data, bytes) else 'wt'
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock of a lock file in path while in context.
+
+    The lock is shared by all processes and threads using the same path.
+    No locking is done on platforms without fcntl.
+    """
+    ensure_dir(os.path.dirname(path))
+    with open(path, 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
 def get_default_cache_base_path():
     return os.path.expanduser(u"~/.distroinfo/cache")
 
@@ -48,10 +94,17 @@ def get_file_age(path):
     return t_now - t_mod
 
 
-def git(*cmd):
+def git(*cmd, **kwargs):
+    """
+    Run git command and return its output.
+
+    Pass cwd= to run the command in a different directory without changing
+    current directory of the whole process.
+    """
     cmd = ['git'] + list(cmd)
     try:
         prc = subprocess.Popen(cmd,
+                               cwd=kwargs.get('cwd'),
                                stdout=subprocess.PIPE,
                                stderr=subprocess.PIPE)
     except OSError:
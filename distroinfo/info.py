@@ -12,11 +12,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import asyncio
+import collections
+import pickle
 import six
 
+from distroinfo import async_fetch
 from distroinfo import exception
 from distroinfo import fetch
 from distroinfo import parse
+from distroinfo import query
+from distroinfo import schema as info_schema
 
 
 class DistroInfo(object):
@@ -27,7 +33,16 @@ class DistroInfo(object):
                  remote_info=None,
                  remote_git_info=None,
                  cache_ttl=3600,
-                 cache_base_path=None):
+                 cache_base_path=None,
+                 cache_max_age=None,
+                 fetch_workers=None,
+                 git_revision=None,
+                 git_checkout=True,
+                 git_clone_depth=None,
+                 git_clone_filter=None,
+                 git_sparse=False,
+                 result_cache_size=0,
+                 result_cache_copy=True):
         """
         Specify distroinfo instance to query.
 
@@ -38,41 +53,386 @@ class DistroInfo(object):
         :param local_info: a shortcut to use LocalInfoFetcher
         :param remote_info: a shortcut to use RemoteRawInfoFetcher
         :param remote_git_info: a shortcut use RemoteGitInfoFetcher
+        :param cache_max_age: use cache older than cache_ttl up to this age
+                              while refreshing it in background
+        :param fetch_workers: number of threads to fetch imports with
+                              using builtin fetchers, sequential if unset
+        :param git_revision: git ref or commit to read info files from using
+                             remote_git_info without a worktree
+        :param git_checkout: set to False to read info files straight from
+                             git objects using remote_git_info
+        :param git_clone_depth: clone and fetch only this many commits of
+                                remote_git_info history
+        :param git_clone_filter: partial clone filter for remote_git_info,
+                                 'blob:none' only downloads needed files
+        :param git_sparse: only check out requested remote_git_info files
+        :param result_cache_size: number of get_info() results to keep and
+                                  return again while fetched sources don't
+                                  change, disabled by default
+        :param result_cache_copy: return copies of cached results,
+                                  set to False to return shared cached
+                                  results which mustn't be modified
         """
         if fetcher:
             self.fetcher = fetcher
         else:
             # convenience shortcuts to builtin info fetchers
             if local_info:
-                self.fetcher = fetch.LocalInfoFetcher(local_info)
+                self.fetcher = fetch.LocalInfoFetcher(
+                    local_info,
+                    max_workers=fetch_workers)
             elif remote_info:
                 self.fetcher = fetch.RemoteInfoFetcher(
                     remote_info,
                     cache_ttl=cache_ttl,
-                    cache_base_path=cache_base_path)
+                    cache_base_path=cache_base_path,
+                    cache_max_age=cache_max_age,
+                    max_workers=fetch_workers)
             elif remote_git_info:
                 self.fetcher = fetch.RemoteGitInfoFetcher(
                     remote_git_info,
                     cache_ttl=cache_ttl,
-                    cache_base_path=cache_base_path)
+                    cache_base_path=cache_base_path,
+                    cache_max_age=cache_max_age,
+                    max_workers=fetch_workers,
+                    revision=git_revision,
+                    checkout=git_checkout,
+                    clone_depth=git_clone_depth,
+                    clone_filter=git_clone_filter,
+                    sparse=git_sparse)
             else:
                 raise exception.InfoFetcherRequired()
         self.fetcher.di_class = DistroInfo
+        self._async_fetcher = None
         self.info_files = info_files
 
         if isinstance(self.info_files, six.string_types):
             # support both a single file and a list
             self.info_files = [self.info_files]
 
-    def get_info(self, apply_tag=None, info_dicts=False):
+        self.result_cache_size = result_cache_size
+        self.result_cache_copy = result_cache_copy
+        self.result_cache = collections.OrderedDict()
+        self.incremental = None
+
+    def get_info(self, apply_tag=None, info_dicts=False,
+                 collect_errors=False, unique_names=False, lazy=False):
         """
         Get data from distroinfo instance.
 
         :param apply_tag: apply supplied tag to info
         :param info_dicts: return packages and releases as dicts
+        :param collect_errors: report all validation errors at once
+                               using InfoValidationFailed exception
+        :param unique_names: require package names to be unique
+        :param lazy: resolve packages only when accessed, full package
+                     validation is then done by info['packages'].validate()
         :return: parsed info metadata
         """
+        kwargs = dict(apply_tag=apply_tag,
+                      info_dicts=info_dicts,
+                      collect_errors=collect_errors,
+                      unique_names=unique_names,
+                      lazy=lazy)
+        if not self.result_cache_size:
+            return self._get_info(**kwargs)
+
+        key = (repr(self.info_files),) + tuple(sorted(kwargs.items()))
+        entry = self.result_cache.get(key)
+        if entry:
+            sources, fingerprint, info = entry
+            if get_sources_fingerprint(sources) == fingerprint:
+                self.result_cache.move_to_end(key)
+                return self._get_cached_result(info)
+            del self.result_cache[key]
+
+        sources = []
+        info = self._get_info(sources=sources, **kwargs)
+        cached_info = info
+        if self.result_cache_copy:
+            cached_info = pickle.dumps(info, protocol=pickle.HIGHEST_PROTOCOL)
+        self.result_cache[key] = (
+            sources, get_sources_fingerprint(sources), cached_info)
+        while len(self.result_cache) > self.result_cache_size:
+            self.result_cache.popitem(last=False)
+        return info
+
+    def refresh_info(self, apply_tag=None, info_dicts=False,
+                     collect_errors=False, unique_names=False):
+        """
+        Get data from distroinfo instance incrementally.
+
+        Result is the same as of get_info() with the same arguments but
+        only info files which changed since last refresh_info() call are
+        loaded again and only packages they contribute are merged and
+        parsed again, see parse.IncrementalInfo. Changes are detected
+        using fetcher.get_fingerprint() of all fetched files (which syncs
+        remote_git_info repo older than cache_ttl) and then
+        fetcher.get_file_fingerprint() of each file. Previous result is
+        returned when nothing changed. Results share packages, don't
+        modify them in place.
+
+        Calling refresh_info() with different arguments starts over.
+        """
+        kwargs = dict(apply_tag=apply_tag,
+                      info_dicts=info_dicts,
+                      collect_errors=collect_errors,
+                      unique_names=unique_names)
+        state = self.incremental
+        if state and state['kwargs'] == kwargs:
+            sources_fingerprint = get_sources_fingerprint(state['sources'])
+            if sources_fingerprint == state['sources_fingerprint']:
+                return state['info']
+            # new fingerprints are only stored once the update succeeds
+            # so that files failing to load are loaded again next time
+            fingerprints = list(state['fingerprints'])
+            contents = list(state['contents'])
+            changed = []
+            for i, (fetcher, fn) in enumerate(state['sources']):
+                fingerprint = fetcher.get_file_fingerprint(fn)
+                if fingerprint == fingerprints[i]:
+                    continue
+                fingerprints[i] = fingerprint
+                old_info = contents[i]
+                info = fetcher.get_file_data(fn)
+                if any(info.get(key) != old_info.get(key)
+                       for key in ('import', 'remote-info')):
+                    # info files changed, start over
+                    state = None
+                    break
+                contents[i] = info
+                changed.append(i)
+            if state and not changed:
+                state.update(sources_fingerprint=sources_fingerprint,
+                             fingerprints=fingerprints)
+                return state['info']
+        else:
+            state = None
+
+        if state:
+            incremental = state['incremental']
+        else:
+            sources = []
+            contents = self.fetcher.fetch(*self.info_files, sources=sources)
+            state = dict(kwargs=kwargs, sources=sources)
+            sources_fingerprint = None
+            fingerprints = [fetcher.get_file_fingerprint(fn)
+                            for fetcher, fn in sources]
+            incremental = parse.IncrementalInfo(**kwargs)
+            changed = None
+        self.incremental = None
+        info = incremental.update(contents, changed=changed)
+        state.update(contents=contents, incremental=incremental, info=info,
+                     sources_fingerprint=sources_fingerprint,
+                     fingerprints=fingerprints)
+        self.incremental = state
+        return info
+
+    def get_tag_infos(self, tags=None, info_dicts=False,
+                      collect_errors=False, unique_names=False):
+        """
+        Get data from distroinfo instance with each of tags applied.
+
+        Info is only fetched, merged and parsed once and packages without
+        overrides for a tag are shared between returned infos which makes
+        this much cheaper than calling get_info(apply_tag=tag) for each
+        tag. Don't modify returned infos in place.
+
+        :param tags: tags to apply, all tags used by packages by default
+        :param info_dicts: return packages and releases as dicts
+        :param collect_errors: report all validation errors at once
+                               using InfoValidationFailed exception
+        :param unique_names: require package names to be unique
+        :return: dict of tag: parsed info metadata with tag applied
+        """
         raw_infos = self.fetcher.fetch(*self.info_files)
         raw_info = parse.merge_infos(*raw_infos, info_dicts=info_dicts)
-        info = parse.parse_info(raw_info, apply_tag=apply_tag)
+        return parse.parse_info_tags(raw_info, tags=tags,
+                                     collect_errors=collect_errors,
+                                     unique_names=unique_names)
+
+    def get_revision_infos(self, revisions, apply_tag=None, info_dicts=False,
+                           collect_errors=False, unique_names=False):
+        """
+        Get data from multiple git revisions of remote_git_info repo.
+
+        Info files are read straight from git objects without a checkout,
+        files unchanged between revisions are only loaded once and each
+        revision is merged and parsed incrementally from the previous one
+        (see parse.IncrementalInfo) so that getting revisions with small
+        changes costs little more than a single get_info(). Results share
+        packages, don't modify them in place.
+
+        :param revisions: git revisions (refs or commits) to get
+        :param apply_tag: apply supplied tag to info
+        :param info_dicts: return packages and releases as dicts
+        :param collect_errors: report all validation errors at once
+                               using InfoValidationFailed exception
+        :param unique_names: require package names to be unique
+        :return: list of parsed info metadata of each revision
+        """
+        if not isinstance(self.fetcher, fetch.RemoteGitInfoFetcher):
+            raise exception.GitInfoFetcherRequired(
+                what="get info of git revisions")
+        incremental = parse.IncrementalInfo(apply_tag=apply_tag,
+                                            info_dicts=info_dicts,
+                                            collect_errors=collect_errors,
+                                            unique_names=unique_names)
+        infos = []
+        last = None
+        # raw data of files unchanged between revisions are only loaded once
+        shared_data = {}
+        for revision in revisions:
+            fetcher = self.fetcher.for_revision(revision,
+                                                shared_data=shared_data)
+            try:
+                sources = []
+                contents = fetcher.fetch(*self.info_files, sources=sources)
+                files = [(fn, f.get_file_version(fn)) for f, fn in sources]
+            finally:
+                fetcher.close()
+            changed = None
+            if last and [fn for fn, _ in last[0]] == [fn for fn, _ in files]:
+                last_files, last_contents = last
+                changed = []
+                for i, (_, version) in enumerate(files):
+                    last_version = last_files[i][1]
+                    if version is None or last_version is None:
+                        # no cheap version, compare contents
+                        if contents[i] != last_contents[i]:
+                            changed.append(i)
+                    elif version != last_version:
+                        changed.append(i)
+            infos.append(incremental.update(contents, changed=changed))
+            last = (files, contents)
+        return infos
+
+    def diff_revisions(self, old_revision, new_revision, apply_tag=None):
+        """
+        Get structural differences between two git revisions of
+        remote_git_info repo, see get_revision_infos() and
+        query.info_diff().
+
+        :param old_revision: git revision to compare with
+        :param new_revision: git revision to compare
+        :param apply_tag: apply supplied tag to info
+        :return: query.info_diff() of infos of both revisions
+        """
+        old_info, new_info = self.get_revision_infos(
+            [old_revision, new_revision], apply_tag=apply_tag)
+        return query.info_diff(old_info, new_info)
+
+    def iter_packages(self, apply_tag=None, info_file=None):
+        """
+        Iterate over resolved packages of an info file one by one.
+
+        The info file is streamed so that memory use doesn't depend on
+        number of packages. package-default and package-configs need to
+        be defined before packages, InvalidInfoFormat is raised otherwise.
+        Imports aren't followed and packages aren't merged nor checked for
+        duplicates, use get_info() for that.
+
+        :param apply_tag: apply supplied tag to packages
+        :param info_file: info file to read (first of info_files by default)
+        :return: generator of parsed packages
+        """
+        if info_file is None:
+            info_file = self.info_files[0]
+        info = {}
+        templates = {}
+        packages_seen = False
+        for key, value in self.fetcher.iter_file_items(info_file):
+            if key == 'packages':
+                packages_seen = True
+                yield parse.parse_package(value, info, apply_tag=apply_tag,
+                                          templates=templates)
+                continue
+            if packages_seen and key in ('package-default',
+                                         'package-configs'):
+                # already yielded packages were resolved without it
+                raise exception.InvalidInfoFormat(
+                    msg="'%s' section must precede packages in %s" % (
+                        key, info_file))
+            info[key] = value
+
+    def validate(self, apply_tag=None, schema=None):
+        """
+        Validate info files and info merged from them against schema.
+
+        All violations are reported at once, see schema.InfoSchema.
+
+        :param apply_tag: apply supplied tag to packages
+        :param schema: schema.InfoSchema to use instead of the default one
+        :raises InfoValidationFailed: with SchemaViolation errors
+        """
+        if schema is None:
+            schema = info_schema.get_default_schema()
+        sources = []
+        contents = self.fetcher.fetch(*self.info_files, sources=sources)
+        files = [(fn, raw_info)
+                 for (_, fn), raw_info in zip(sources, contents)]
+        errors = schema.validate(files, apply_tag=apply_tag)
+        if errors:
+            raise exception.InfoValidationFailed(errors=errors)
+
+    def _get_info(self, sources=None, **kwargs):
+        raw_infos = self.fetcher.fetch(*self.info_files, sources=sources)
+        return self._parse_infos(raw_infos, **kwargs)
+
+    @property
+    def async_fetcher(self):
+        """
+        asyncio counterpart of self.fetcher used by get_info_async()
+        """
+        if not self._async_fetcher:
+            self._async_fetcher = async_fetch.get_async_fetcher(self.fetcher)
+        return self._async_fetcher
+
+    async def get_info_async(self, apply_tag=None, info_dicts=False,
+                             collect_errors=False, unique_names=False,
+                             lazy=False):
+        """
+        Get data from distroinfo instance without blocking event loop.
+
+        Info files are fetched concurrently using self.async_fetcher,
+        merging and parsing is done in a thread.
+
+        See get_info() for parameters.
+        """
+        raw_infos = await self.async_fetcher.fetch(*self.info_files)
+        return await asyncio.to_thread(
+            self._parse_infos, raw_infos,
+            apply_tag=apply_tag, info_dicts=info_dicts,
+            collect_errors=collect_errors, unique_names=unique_names,
+            lazy=lazy)
+
+    def _parse_infos(self, raw_infos, apply_tag=None, info_dicts=False,
+                     collect_errors=False, unique_names=False, lazy=False):
+        raw_info = parse.merge_infos(*raw_infos, info_dicts=info_dicts)
+        return parse.parse_info(raw_info, apply_tag=apply_tag,
+                                collect_errors=collect_errors,
+                                unique_names=unique_names,
+                                lazy=lazy)
+
+    def _get_cached_result(self, info):
+        if self.result_cache_copy:
+            # unpickling is a fast way to get a deep copy
+            return pickle.loads(info)
         return info
+
+    def invalidate_cache(self):
+        """
+        Drop all cached get_info() results.
+        """
+        self.result_cache.clear()
+
+
+def get_sources_fingerprint(sources):
+    """
+    Return a fingerprint of sources collected by InfoFetcher.fetch()
+    """
+    files = collections.OrderedDict()
+    for fetcher, fn in sources:
+        files.setdefault(fetcher, []).append(fn)
+    return tuple(fetcher.get_fingerprint(fns)
+                 for fetcher, fns in files.items())
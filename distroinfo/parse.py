@@ -14,29 +14,94 @@
 
 import collections
 import copy
+import re
 import six
 
 try:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Mapping, Sequence
 except ImportError:
-    from collections import Iterable
+    from collections import Iterable, Mapping, Sequence
 
 from distroinfo import exception
 
 
-def parse_info(raw_info, apply_tag=None):
+def parse_info(raw_info, apply_tag=None, collect_errors=False,
+               unique_names=False, lazy=False, parsed_cache=None):
     """
     Parse raw rdoinfo metadata inplace.
 
     :param raw_info: raw info to parse
     :param apply_tag: tag to apply
+    :param collect_errors: validate whole info and raise all errors at once
+                           as InfoValidationFailed instead of the first one
+    :param unique_names: also require package names to be unique
+    :param lazy: only resolve packages when accessed, see LazyPackages
+    :param parsed_cache: see parse_packages()
     :returns: dictionary containing all packages in rdoinfo
     """
-    parse_releases(raw_info)
-    parse_packages(raw_info, apply_tag=apply_tag)
+    errors = [] if collect_errors else None
+    parse_releases(raw_info, errors=errors)
+    if lazy:
+        lazy_packages(raw_info, apply_tag=apply_tag, errors=errors,
+                      unique_names=unique_names)
+    else:
+        parse_packages(raw_info, apply_tag=apply_tag, errors=errors,
+                       unique_names=unique_names, parsed_cache=parsed_cache)
+    if errors:
+        raise exception.InfoValidationFailed(errors=errors)
     return raw_info
 
 
+def parse_info_tags(raw_info, tags=None, collect_errors=False,
+                    unique_names=False):
+    """
+    Parse raw rdoinfo metadata inplace once and derive infos with tags
+    applied from it.
+
+    Result for each tag is the same as parse_info() with apply_tag=tag
+    but tag-independent part is only parsed once: releases and packages
+    without overrides for a tag are shared by all infos (don't modify
+    them in place), only packages with tag overrides are resolved again.
+
+    Packages are parsed without tag leniently as they might only be
+    valid with a tag applied: packages failing to parse are parsed again
+    with each tag and only errors remaining with a tag are raised.
+
+    :param raw_info: raw info to parse
+    :param tags: tags to apply, all tags of packages by default
+    :param collect_errors: see parse_info()
+    :param unique_names: see parse_info()
+    :returns: dict of tag: info
+    """
+    errors = [] if collect_errors else None
+    parse_releases(raw_info, errors=errors)
+    pkgs = parse_untagged_packages(raw_info, errors=errors)
+    if errors:
+        raise exception.InfoValidationFailed(errors=errors)
+    info_dicts = isinstance(raw_info['packages'], dict)
+    if tags is None:
+        tags = get_packages_tags(pkgs, raw_info)
+    templates = {}
+    tag_infos = collections.OrderedDict()
+    for tag in tags:
+        errors = [] if collect_errors else None
+        tag_info = raw_info.copy()
+        tag_info['packages'] = apply_packages_tag(
+            pkgs, raw_info, tag, info_dicts=info_dicts, errors=errors,
+            unique_names=unique_names, templates=templates)
+        if errors:
+            raise exception.InfoValidationFailed(errors=errors)
+        tag_infos[tag] = tag_info
+    return tag_infos
+
+
+def _handle_error(error, errors):
+    # raise right away unless errors are being collected
+    if errors is None:
+        raise error
+    errors.append(error)
+
+
 def parse_release_repo(repo, default_branch=None):
     if 'name' not in repo:
         raise exception.MissingRequiredItem(item='repo.name in %s' % repo)
@@ -49,33 +114,44 @@ def parse_release_repo(repo, default_branch=None):
     return repo
 
 
-def parse_releases(info):
+def parse_releases(info, errors=None):
     try:
         releases = info['releases']
     except KeyError:
-        raise exception.MissingRequiredSection(section='releases')
+        _handle_error(
+            exception.MissingRequiredSection(section='releases'), errors)
+        return None
     if not isinstance(releases, Iterable):
-        raise exception.InvalidInfoFormat(
-            msg="'releases' section must be iterable")
+        _handle_error(exception.InvalidInfoFormat(
+            msg="'releases' section must be iterable"), errors)
+        return None
     if isinstance(releases, dict):
         releases = releases.values()
     for rls in releases:
         try:
-            rls_name = rls['name']
-        except KeyError:
-            raise exception.MissingRequiredItem(
-                item='release.name in %s' % rls)
-        try:
-            repos = rls['repos']
-        except KeyError:
-            raise exception.MissingRequiredItem(
-                item='release.repos for release %s' % rls_name)
-        default_branch = rls.get('branch')
-        for repo in repos:
-            parse_release_repo(repo, default_branch)
+            parse_release(rls)
+        except exception.InvalidInfoFormat as e:
+            _handle_error(e, errors)
     return releases
 
 
+def parse_release(rls):
+    try:
+        rls_name = rls['name']
+    except KeyError:
+        raise exception.MissingRequiredItem(
+            item='release.name in %s' % rls)
+    try:
+        repos = rls['repos']
+    except KeyError:
+        raise exception.MissingRequiredItem(
+            item='release.repos for release %s' % rls_name)
+    default_branch = rls.get('branch')
+    for repo in repos:
+        parse_release_repo(repo, default_branch)
+    return rls
+
+
 def parse_package_configs(info):
     if 'package-default' not in info:
         info['package-default'] = {}
@@ -84,38 +160,109 @@ def parse_package_configs(info):
     return info['package-default'], info['package-configs']
 
 
-def substitute_package(pkg):
+TEMPLATE_FIELD_RE = re.compile(r'%(?:\(([^()]*)\)s|%)')
+
+
+def split_template(txt):
+    """
+    Split %-format string into a tuple of alternating literal text and
+    field names: ('openstack-', 'project', '') for 'openstack-%(project)s'
+
+    Only %(field)s and %% are supported, None is returned for other
+    format strings.
+    """
+    parts = []
+    literal = ''
+    last = 0
+    for m in TEMPLATE_FIELD_RE.finditer(txt):
+        text = txt[last:m.start()]
+        if '%' in text:
+            return None
+        field = m.group(1)
+        if field is None:
+            # %% escape
+            literal += text + '%'
+        else:
+            parts += [literal + text, field]
+            literal = ''
+        last = m.end()
+    text = txt[last:]
+    if '%' in text:
+        return None
+    parts.append(literal + text)
+    return tuple(parts)
+
+
+def compile_template(txt):
+    """
+    Compile %-format string into a function rendering it from package
+    dict which gives the same result as txt % pkg.
+    """
+    parts = split_template(txt)
+    if parts is None:
+        # not a simple template, use generic formatting
+        return lambda pkg: txt % pkg
+    if len(parts) == 1:
+        text = parts[0]
+        return lambda pkg: text
+    if len(parts) == 3:
+        # most common case: a single field
+        prefix, field, suffix = parts
+
+        def render(pkg):
+            val = pkg[field]
+            if val.__class__ is not str:
+                val = str(val)
+            return prefix + val + suffix
+        return render
+
+    def render(pkg):
+        out = list(parts)
+        for i in range(1, len(out), 2):
+            out[i] = str(pkg[out[i]])
+        return ''.join(out)
+    return render
+
+
+def substitute_package(pkg, templates=None):
+    new_pkg = copy.copy(pkg)
+    new_pkg.update(get_package_substitutions(pkg, templates=templates))
+    return new_pkg
+
+
+def get_package_substitutions(pkg, templates=None):
+    """
+    Return a dict of substituted string values of package.
+
+    Values without placeholders are skipped, templates are compiled
+    using compile_template().
+
+    :param templates: dict of compiled templates to use and update
+    """
     # substitution is very simple, no recursion
     # feel free to extend this as long as you provide proper tests
-    new_pkg = copy.copy(pkg)
+    if templates is None:
+        templates = {}
+    subst = {}
     for key, val in pkg.items():
-        if isinstance(val, six.string_types):
+        if isinstance(val, six.string_types) and '%' in val:
+            try:
+                render = templates[val]
+            except KeyError:
+                render = templates[val] = compile_template(val)
             try:
-                new_pkg[key] = val % pkg
+                subst[key] = render(pkg)
             except KeyError:
                 raise exception.SubstitutionFailed(txt=val)
-    return new_pkg
+    return subst
 
 
-def parse_package(pkg, info, apply_tag=None):
-    pkddefault, pkgconfs = parse_package_configs(info)
-    # start with default package config
-    parsed_pkg = copy.deepcopy(pkddefault)
-    if 'conf' in pkg:
-        # apply package configuration template
-        conf_id = pkg['conf']
-        try:
-            conf = pkgconfs[conf_id]
-        except KeyError:
-            raise exception.UndefinedPackageConfig(conf=conf_id)
-        parsed_pkg.update(conf)
-    parsed_pkg.update(pkg)
-    if apply_tag:
-        tags = parsed_pkg.get('tags', {})
-        tagdict = tags.get(apply_tag)
-        if tagdict:
-            parsed_pkg.update(tagdict)
-    pkg = substitute_package(parsed_pkg)
+def parse_package(pkg, info, apply_tag=None, templates=None):
+    """
+    Resolve package using resolve_package() and validate it.
+    """
+    pkg = resolve_package(pkg, info, apply_tag=apply_tag,
+                          templates=templates)
 
     try:
         name = pkg['name']
@@ -144,21 +291,68 @@ def parse_package(pkg, info, apply_tag=None):
     return pkg
 
 
-def _check_for_duplicates(pkg, pkgs):
-    for oldpkg in pkgs:
-        if pkg['name'] == oldpkg['name']:
-            return True
-    return False
+def resolve_package(pkg, info, apply_tag=None, templates=None):
+    """
+    Resolve package by layering it over package-default and
+    package-configs templates and substitute its string values.
+
+    Layers are applied copy-on-write: only the top level dict of resolved
+    package is new, values inherited from package-default and
+    package-configs are shared by all packages and mustn't be modified
+    in place.
+
+    :param templates: dict of compiled templates shared by packages of
+                      the same info so that each template (typically from
+                      package-default and package-configs) is only
+                      compiled once
+    """
+    pkddefault, pkgconfs = parse_package_configs(info)
+    # start with default package config
+    parsed_pkg = pkddefault.copy()
+    if 'conf' in pkg:
+        # apply package configuration template
+        conf_id = pkg['conf']
+        try:
+            conf = pkgconfs[conf_id]
+        except KeyError:
+            raise exception.UndefinedPackageConfig(conf=conf_id)
+        parsed_pkg.update(conf)
+    parsed_pkg.update(pkg)
+    if apply_tag:
+        tags = parsed_pkg.get('tags', {})
+        tagdict = tags.get(apply_tag)
+        if tagdict:
+            parsed_pkg.update(tagdict)
+    # substitutions need unsubstituted values, apply them afterwards
+    parsed_pkg.update(get_package_substitutions(parsed_pkg,
+                                                templates=templates))
+    return parsed_pkg
+
 
+def parse_packages(info, apply_tag=None, errors=None, unique_names=False,
+                   parsed_cache=None):
+    """
+    Parse and validate 'packages' section of info inplace.
+
+    Duplicate projects (and names with unique_names=True) are detected
+    using sets so validation is linear. Pass a list as errors to collect
+    all validation errors into it instead of raising the first one.
 
-def parse_packages(info, apply_tag=None):
+    parsed_cache is an optional dict of id(raw package): (raw package,
+    parsed package) used to skip parsing of the very same raw package
+    objects again, it's updated with newly parsed packages. It's only
+    valid for the same package-default, package-configs and apply_tag.
+    """
     try:
         pkgs = info['packages']
     except KeyError:
-        raise exception.MissingRequiredSection(section='packages')
+        _handle_error(
+            exception.MissingRequiredSection(section='packages'), errors)
+        return
     if not isinstance(pkgs, Iterable):
-        raise exception.InvalidInfoFormat(
-            msg="'packages' section must be iterable")
+        _handle_error(exception.InvalidInfoFormat(
+            msg="'packages' section must be iterable"), errors)
+        return
     if isinstance(pkgs, dict):
         # 'packages' is a dictionary
         info_dicts = True
@@ -168,20 +362,324 @@ def parse_packages(info, apply_tag=None):
         # 'packages' is a list
         info_dicts = False
         parsed_pkgs = []
-        seen_projects = []
+    seen_projects = set()
+    seen_names = set()
+    templates = {}
     for pkg in pkgs:
-        parsed_pkg = parse_package(pkg, info, apply_tag=apply_tag)
+        parsed_pkg = None
+        if parsed_cache is not None:
+            cached = parsed_cache.get(id(pkg))
+            if cached and cached[0] is pkg:
+                parsed_pkg = cached[1]
+        if parsed_pkg is None:
+            try:
+                parsed_pkg = parse_package(pkg, info, apply_tag=apply_tag,
+                                           templates=templates)
+            except exception.InvalidInfoFormat as e:
+                _handle_error(e, errors)
+                continue
+            if parsed_cache is not None:
+                parsed_cache[id(pkg)] = (pkg, parsed_pkg)
         project = parsed_pkg['project']
         if info_dicts:
             parsed_pkgs[project] = parsed_pkg
         else:
             if project in seen_projects:
-                raise exception.DuplicatedProject(prj=parsed_pkg['project'])
-            seen_projects.append(project)
+                _handle_error(exception.DuplicatedProject(prj=project),
+                              errors)
+                continue
+            seen_projects.add(project)
             parsed_pkgs.append(parsed_pkg)
+        if unique_names:
+            name = parsed_pkg['name']
+            if name in seen_names:
+                _handle_error(exception.DuplicatedPackage(name=name), errors)
+            seen_names.add(name)
     info['packages'] = parsed_pkgs
 
 
+def get_info_tags(info):
+    """
+    Return a list of all tags used by packages of parsed info.
+    """
+    pkgs = info.get('packages') or []
+    if isinstance(pkgs, dict):
+        pkgs = pkgs.values()
+    tags = collections.OrderedDict()
+    for pkg in pkgs:
+        tags.update(dict.fromkeys(pkg.get('tags') or {}))
+    return list(tags)
+
+
+def parse_untagged_packages(info, errors=None):
+    """
+    Parse packages of info without tag, keeping packages which fail.
+
+    Only errors of 'packages' section itself are handled, errors of
+    individual packages are returned instead.
+
+    :returns: list of (raw package, parsed package, error) tuples where
+              either parsed package or error is None, None when
+              'packages' section is missing or invalid
+    """
+    try:
+        raw_pkgs = info['packages']
+    except KeyError:
+        _handle_error(
+            exception.MissingRequiredSection(section='packages'), errors)
+        return None
+    if not isinstance(raw_pkgs, Iterable):
+        _handle_error(exception.InvalidInfoFormat(
+            msg="'packages' section must be iterable"), errors)
+        return None
+    if isinstance(raw_pkgs, dict):
+        raw_pkgs = raw_pkgs.values()
+    pkgs = []
+    templates = {}
+    for raw_pkg in raw_pkgs:
+        try:
+            pkg = parse_package(raw_pkg, info, templates=templates)
+        except exception.InvalidInfoFormat as e:
+            pkgs.append((raw_pkg, None, e))
+            continue
+        pkgs.append((raw_pkg, pkg, None))
+    return pkgs
+
+
+def get_packages_tags(pkgs, info):
+    """
+    Return a list of all tags used by packages from
+    parse_untagged_packages() including packages which failed to parse.
+    """
+    pkgdefault, pkgconfs = parse_package_configs(info)
+    tags = collections.OrderedDict()
+    for raw_pkg, pkg, _ in pkgs:
+        if pkg is None:
+            # tags aren't substituted, layers are enough
+            conf = pkgconfs.get(raw_pkg.get('conf')) or {}
+            for pkg in (raw_pkg, conf, pkgdefault):
+                if 'tags' in pkg:
+                    break
+        tags.update(dict.fromkeys(pkg.get('tags') or {}))
+    return list(tags)
+
+
+def apply_packages_tag(pkgs, info, tag, info_dicts=False, errors=None,
+                       unique_names=False, templates=None):
+    """
+    Return packages parsed with tag applied as a new list (or dict)
+    sharing packages parsed without tag which have no tag overrides.
+
+    Packages which failed to parse without tag are parsed with tag and
+    validation is the same as parse_packages() with apply_tag=tag.
+
+    :param pkgs: packages from parse_untagged_packages()
+    """
+    if info_dicts:
+        parsed_pkgs = collections.OrderedDict()
+    else:
+        parsed_pkgs = []
+    seen_projects = set()
+    seen_names = set()
+    for raw_pkg, pkg, _ in pkgs:
+        if pkg is None or pkg.get('tags', {}).get(tag):
+            try:
+                pkg = parse_package(raw_pkg, info, apply_tag=tag,
+                                    templates=templates)
+            except exception.InvalidInfoFormat as e:
+                _handle_error(e, errors)
+                continue
+        project = pkg['project']
+        if info_dicts:
+            parsed_pkgs[project] = pkg
+        else:
+            if project in seen_projects:
+                _handle_error(exception.DuplicatedProject(prj=project),
+                              errors)
+                continue
+            seen_projects.add(project)
+            parsed_pkgs.append(pkg)
+        if unique_names:
+            name = pkg['name']
+            if name in seen_names:
+                _handle_error(exception.DuplicatedPackage(name=name), errors)
+            seen_names.add(name)
+    return parsed_pkgs
+
+
+def lazy_packages(info, apply_tag=None, errors=None, unique_names=False):
+    """
+    Replace 'packages' section of info with LazyPackages (list) or
+    LazyPackagesDict (dict) resolving packages on demand.
+    """
+    try:
+        pkgs = info['packages']
+    except KeyError:
+        _handle_error(
+            exception.MissingRequiredSection(section='packages'), errors)
+        return
+    if isinstance(pkgs, dict):
+        lazy_class = LazyPackagesDict
+    elif isinstance(pkgs, Iterable):
+        lazy_class = LazyPackages
+    else:
+        _handle_error(exception.InvalidInfoFormat(
+            msg="'packages' section must be iterable"), errors)
+        return
+    parse_package_configs(info)
+    info['packages'] = lazy_class(pkgs, info, apply_tag=apply_tag,
+                                  unique_names=unique_names)
+
+
+def get_package_name(pkg, info, apply_tag=None, templates=None):
+    """
+    Return substituted name of raw package without resolving the rest.
+    """
+    pkddefault, pkgconfs = parse_package_configs(info)
+    layered_pkg = pkddefault.copy()
+    conf = pkgconfs.get(pkg.get('conf'))
+    if conf:
+        layered_pkg.update(conf)
+    layered_pkg.update(pkg)
+    if apply_tag:
+        tagdict = layered_pkg.get('tags', {}).get(apply_tag)
+        if tagdict:
+            layered_pkg.update(tagdict)
+    name = layered_pkg.get('name')
+    if not isinstance(name, six.string_types) or '%' not in name:
+        return name
+    if templates is None:
+        templates = {}
+    try:
+        render = templates[name]
+    except KeyError:
+        render = templates[name] = compile_template(name)
+    try:
+        return render(layered_pkg)
+    except KeyError:
+        raise exception.SubstitutionFailed(txt=name)
+
+
+class _LazyPackagesBase(object):
+    def __init__(self, pkgs, info, apply_tag=None, unique_names=False):
+        self.info = info
+        self.apply_tag = apply_tag
+        self.unique_names = unique_names
+        self.raw_packages = pkgs
+        self.packages = {}
+        self.name_index = None
+        self.templates = {}
+
+    def resolve(self, key):
+        pkg = self.packages.get(key)
+        if pkg is None:
+            pkg = parse_package(self.raw_packages[key], self.info,
+                                apply_tag=self.apply_tag,
+                                templates=self.templates)
+            self.packages[key] = pkg
+        return pkg
+
+    def get_package(self, name):
+        """
+        Return resolved package by name or None.
+
+        Only names of packages are resolved to find the right one.
+        """
+        if self.name_index is None:
+            index = {}
+            for key in self.keys():
+                pkg_name = get_package_name(self.raw_packages[key],
+                                            self.info, self.apply_tag,
+                                            templates=self.templates)
+                index.setdefault(pkg_name, key)
+            self.name_index = index
+        key = self.name_index.get(name)
+        if key is None:
+            return None
+        return self.resolve(key)
+
+    def validate(self, collect_errors=False):
+        """
+        Resolve and validate all packages just like parse_packages().
+
+        :param collect_errors: raise all errors at once as
+                               InfoValidationFailed
+        """
+        errors = [] if collect_errors else None
+        info = dict(self.info, packages=self.raw_packages)
+        parsed_cache = {}
+        parse_packages(info, apply_tag=self.apply_tag, errors=errors,
+                       unique_names=self.unique_names,
+                       parsed_cache=parsed_cache)
+        if errors:
+            raise exception.InfoValidationFailed(errors=errors)
+        # map parsed packages back to keys by their raw package
+        for key in self.keys():
+            cached = parsed_cache.get(id(self.raw_packages[key]))
+            if cached:
+                self.packages[key] = cached[1]
+
+
+class LazyPackages(_LazyPackagesBase, Sequence):
+    """
+    'packages' list resolving each package on first access.
+
+    Accessed packages are resolved using parse_package() and cached,
+    errors are only raised for packages being accessed. Use validate() to
+    resolve and check all packages including duplicates.
+    """
+    def __init__(self, pkgs, info, apply_tag=None, unique_names=False):
+        super(LazyPackages, self).__init__(
+            list(pkgs), info, apply_tag=apply_tag, unique_names=unique_names)
+
+    def keys(self):
+        return range(len(self.raw_packages))
+
+    def __len__(self):
+        return len(self.raw_packages)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.resolve(j) for j in self.keys()[i]]
+        if i < 0:
+            i += len(self.raw_packages)
+        if not 0 <= i < len(self.raw_packages):
+            raise IndexError('package index out of range')
+        return self.resolve(i)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyPackages)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'LazyPackages(%d packages)' % len(self)
+
+
+class LazyPackagesDict(_LazyPackagesBase, Mapping):
+    """
+    'packages' dict (info_dicts=True) resolving each package on first
+    access, see LazyPackages.
+    """
+    def keys(self):
+        return self.raw_packages.keys()
+
+    def __len__(self):
+        return len(self.raw_packages)
+
+    def __iter__(self):
+        return iter(self.raw_packages)
+
+    def __getitem__(self, key):
+        return self.resolve(key)
+
+    def __repr__(self):
+        return 'LazyPackagesDict(%d packages)' % len(self)
+
+
 def _merge(a, b):
     # recursively merge arbitrary data structures
     if isinstance(a, dict) and isinstance(b, dict):
@@ -197,6 +695,114 @@ def _merge(a, b):
     return b
 
 
+class Merger(object):
+    """
+    Merge arbitrary data structures into an accumulated result with the
+    same semantics as _merge(): dicts are merged recursively, lists are
+    concatenated and None keeps the old value.
+
+    Unlike _merge() which copies the whole left side on every merge,
+    containers are only copied the first time they're merged into, they
+    are modified in place afterwards. Merged data is never modified and
+    parts of it which don't need merging are shared with the result.
+    """
+    def __init__(self):
+        # containers created by this merger, safe to modify in place,
+        # references are kept so that their ids stay unique
+        self.owned = {}
+
+    def own(self, obj):
+        self.owned[id(obj)] = obj
+        return obj
+
+    def get_own(self, obj):
+        """
+        Return obj if it can be modified in place, its own copy otherwise.
+        """
+        if id(obj) in self.owned:
+            return obj
+        return self.own(obj.copy())
+
+    def merge(self, a, b):
+        if isinstance(a, dict) and isinstance(b, dict):
+            a = self.get_own(a)
+            self.merge_dict(a, b)
+            return a
+
+        if isinstance(a, list) and isinstance(b, list):
+            if id(a) in self.owned:
+                a += b
+                return a
+            return self.own(a + b)
+
+        if b is None:
+            return a
+        return b
+
+    def merge_dict(self, a, b):
+        # merge dict b into own dict a in place
+        for k, v in b.items():
+            old = a.get(k, None)
+            if old is None:
+                a[k] = v
+            elif isinstance(v, (dict, list)):
+                a[k] = self.merge(old, v)
+            elif v is not None:
+                # shortcut for the most common case: scalar value
+                a[k] = v
+
+    def merge_list(self, a, items, key):
+        """
+        Merge list of dicts into dict a indexed by key.
+
+        This is the same as self.merge(a, list2dict(items, key)) without
+        building the intermediate dict, values of key must be unique
+        within items. Items are merged directly into indexed dicts
+        which makes sparse overlays (such as buildsys-tags adding a
+        single nested key to many packages) cheap.
+        """
+        a = self.get_own(a)
+        owned = self.owned
+        for item in items:
+            k = item.get(key)
+            pkg = a.get(k, None)
+            if not isinstance(pkg, dict):
+                a[k] = self.merge(pkg, item)
+                continue
+            if id(pkg) not in owned:
+                pkg = a[k] = self.own(pkg.copy())
+            # self.merge_dict(pkg, item) inlined with nested dicts
+            # merged directly
+            for ik, iv in item.items():
+                old = pkg.get(ik, None)
+                if old is None:
+                    pkg[ik] = iv
+                elif isinstance(iv, dict) and isinstance(old, dict):
+                    if id(old) not in owned:
+                        old = pkg[ik] = self.own(old.copy())
+                    self.merge_dict(old, iv)
+                elif isinstance(iv, list):
+                    pkg[ik] = self.merge(old, iv)
+                elif iv is not None:
+                    pkg[ik] = iv
+        return a
+
+
+def _is_packages_overlay(info):
+    # info only adding to packages such as buildsys-tags files
+    if len(info) != 1:
+        return False
+    pkgs = info.get('packages')
+    if not pkgs or not isinstance(pkgs, list):
+        return False
+    try:
+        projects = set(pkg.get('project') for pkg in pkgs)
+    except AttributeError:
+        return False
+    # duplicates would need merging first
+    return len(projects) == len(pkgs)
+
+
 def list2dict(_list, key):
     d = collections.OrderedDict()
     for i in _list:
@@ -265,11 +871,144 @@ def merge_infos(*infos, **kwargs):
             return info2dicts(infos[0], in_place=in_place)
         return infos[0]
     info_dict = info2dicts(infos[0], in_place=in_place)
+    merger = Merger()
     for info_next in infos[1:]:
+        pkgs = info_dict.get('packages')
+        if isinstance(pkgs, dict) and _is_packages_overlay(info_next):
+            # fast path for overlays: merge packages directly into
+            # already indexed packages
+            info_dict = merger.get_own(info_dict)
+            info_dict['packages'] = merger.merge_list(
+                pkgs, info_next['packages'], 'project')
+            continue
         info_next_dict = info2dicts(info_next, in_place=in_place)
-        info_dict = _merge(info_dict, info_next_dict)
+        info_dict = merger.merge(info_dict, info_next_dict)
     if info_dicts:
         # return info with dicts
         return info_dict
     # convert info back to lists format
     return info2lists(info_dict, in_place=in_place)
+
+
+class IncrementalInfo(object):
+    """
+    Merge and parse raw infos of info files incrementally.
+
+    update() returns the same result as
+    parse_info(merge_infos(*infos), ...) but packages contributed only by
+    info files which didn't change since last update() are neither merged
+    nor parsed again and they're shared between results, don't modify
+    them in place.
+    """
+    def __init__(self, apply_tag=None, info_dicts=False,
+                 collect_errors=False, unique_names=False):
+        self.apply_tag = apply_tag
+        self.info_dicts = info_dicts
+        self.collect_errors = collect_errors
+        self.unique_names = unique_names
+        self.reset()
+
+    def reset(self):
+        self.infos = []
+        # packages of each info indexed by project
+        self.info_pkgs = []
+        self.merged_pkgs = collections.OrderedDict()
+        self.pkg_configs = None
+        self.parsed_cache = {}
+
+    def update(self, infos, changed=None):
+        """
+        Merge and parse raw infos.
+
+        :param infos: raw infos of all info files in merge order
+        :param changed: indexes of infos changed since last update(),
+                        all infos are considered changed by default
+        :returns: parsed info
+        """
+        try:
+            return self._update(infos, changed=changed)
+        except Exception:
+            self.reset()
+            raise
+
+    def _update(self, infos, changed=None):
+        if not all(map(_is_incremental_info, infos)) or len(infos) < 2:
+            # merge_infos() special cases, no need to optimize them
+            self.reset()
+            raw_info = merge_infos(*copy.deepcopy(infos),
+                                   info_dicts=self.info_dicts)
+            return self._parse(raw_info)
+        if changed is None or len(infos) != len(self.infos):
+            changed = range(len(infos))
+            info_pkgs = [{}] * len(infos)
+        else:
+            info_pkgs = list(self.info_pkgs)
+        # re-merge packages whose entries in changed infos changed
+        affected = set()
+        reorder = False
+        for i in changed:
+            old_pkgs = info_pkgs[i]
+            new_pkgs = list2dict(infos[i].get('packages') or [], 'project')
+            for project, pkg in new_pkgs.items():
+                if old_pkgs.get(project) != pkg:
+                    affected.add(project)
+            affected.update(set(old_pkgs).difference(new_pkgs))
+            reorder = reorder or list(old_pkgs) != list(new_pkgs)
+            info_pkgs[i] = new_pkgs
+        merged_pkgs = self.merged_pkgs.copy()
+        merger = Merger()
+        for project in affected:
+            pkg = None
+            for pkgs in info_pkgs:
+                if project in pkgs:
+                    pkg = merger.merge(pkg, pkgs[project])
+            if pkg is None:
+                del merged_pkgs[project]
+            else:
+                reorder = reorder or project not in merged_pkgs
+                merged_pkgs[project] = pkg
+        if reorder:
+            # keep merge_infos() order of packages
+            order = collections.OrderedDict()
+            for pkgs in info_pkgs:
+                order.update(dict.fromkeys(pkgs))
+            merged_pkgs = collections.OrderedDict(
+                (project, merged_pkgs[project]) for project in order)
+        # rest of info is small, merge it all, parse_info() modifies it
+        rest_infos = [dict((k, v) for k, v in info.items() if k != 'packages')
+                      for info in infos]
+        raw_info = merge_infos(*copy.deepcopy(rest_infos), info_dicts=True)
+        if merged_pkgs:
+            raw_info['packages'] = merged_pkgs.copy()
+        if not self.info_dicts:
+            info2lists(raw_info, in_place=True)
+        # packages need to be parsed again when their templates change
+        pkg_configs = (raw_info.get('package-default'),
+                       raw_info.get('package-configs'))
+        parsed_cache = self.parsed_cache
+        if pkg_configs != self.pkg_configs:
+            parsed_cache = {}
+        info = self._parse(raw_info, parsed_cache=parsed_cache)
+        # drop parsed packages no longer used
+        self.parsed_cache = dict(
+            (id(pkg), parsed_cache[id(pkg)])
+            for pkg in merged_pkgs.values() if id(pkg) in parsed_cache)
+        self.infos = list(infos)
+        self.info_pkgs = info_pkgs
+        self.merged_pkgs = merged_pkgs
+        self.pkg_configs = pkg_configs
+        return info
+
+    def _parse(self, raw_info, parsed_cache=None):
+        return parse_info(raw_info, apply_tag=self.apply_tag,
+                          collect_errors=self.collect_errors,
+                          unique_names=self.unique_names,
+                          parsed_cache=parsed_cache)
+
+
+def _is_incremental_info(info):
+    # empty or dict packages change merge_infos() semantics
+    if 'packages' not in info:
+        return True
+    pkgs = info['packages']
+    return isinstance(pkgs, list) and bool(pkgs)
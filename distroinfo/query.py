@@ -13,19 +13,21 @@
 # under the License.
 
 from __future__ import print_function
-from functools import partial
+import functools
 import re
 import six
 
 try:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Mapping
 except ImportError:
-    from collections import Iterable
+    from collections import Iterable, Mapping
 
 from distroinfo import exception
 
 
 def get_release(info, release):
+    if isinstance(info, InfoIndex):
+        return info.get_release(release)
     for rls in info['releases']:
         if rls.get('name') == release:
             return rls
@@ -33,13 +35,21 @@ def get_release(info, release):
 
 
 def get_package(info, name):
-    for pkg in info['packages']:
+    if isinstance(info, InfoIndex):
+        return info.get_package(name)
+    pkgs = info['packages']
+    if hasattr(pkgs, 'get_package'):
+        # lazy packages, see parse.LazyPackages
+        return pkgs.get_package(name)
+    for pkg in pkgs:
         if pkg['name'] == name:
             return pkg
     return None
 
 
 def find_package(info, package, strict=False):
+    if isinstance(info, InfoIndex):
+        return info.find_package(package, strict=strict)
     # 1. strict package name matching (openstack-nova)
     pkg = get_package(info, package)
     if pkg:
@@ -68,6 +78,178 @@ def find_package(info, package, strict=False):
     return None
 
 
+# length of n-grams used by InfoIndex for best effort search
+NGRAM_SIZE = 3
+
+
+def _get_ngrams(text):
+    return set(text[i:i + NGRAM_SIZE]
+               for i in range(len(text) - NGRAM_SIZE + 1))
+
+
+class InfoIndex(Mapping):
+    """
+    Parsed info with hash indexes for package and release lookups
+
+    Pass it to get_package(), get_release() and find_package() instead
+    of info to avoid scanning all packages on each call, results are the
+    same. It can be used as read-only info by other queries too.
+
+    Best effort find_package() matching uses n-gram indexes of lowercase
+    package names and projects, see also search_packages().
+
+    Indexes are built once, create a new InfoIndex when info changes.
+    """
+    def __init__(self, info):
+        self.info = info
+        pkgs = info.get('packages') or []
+        if isinstance(pkgs, Mapping):
+            pkgs = pkgs.values()
+        self.packages = list(pkgs)
+        # first package/release wins like with linear search
+        self.names = {}
+        self.projects = {}
+        self.upstreams = {}
+        # lowercase project and name of each package for best effort search
+        self.lower_projects = []
+        self.lower_names = []
+        for i, pkg in enumerate(self.packages):
+            name = pkg.get('name')
+            self.names.setdefault(name, pkg)
+            project = pkg.get('project')
+            if isinstance(project, six.string_types):
+                project = project.lower()
+                self.projects.setdefault(project, i)
+            else:
+                project = None
+            self.lower_projects.append(project)
+            upstream = pkg.get('upstream')
+            if isinstance(upstream, six.string_types):
+                self.upstreams.setdefault(strip_project_url(upstream), i)
+            if isinstance(name, six.string_types):
+                name = name.lower()
+            else:
+                name = None
+            self.lower_names.append(name)
+        rlss = info.get('releases') or []
+        if isinstance(rlss, Mapping):
+            rlss = rlss.values()
+        self.releases = {}
+        for rls in rlss:
+            self.releases.setdefault(rls.get('name'), rls)
+        self.name_ngrams = None
+        self.project_ngrams = None
+        self.short_projects = None
+
+    def __getitem__(self, key):
+        return self.info[key]
+
+    def __iter__(self):
+        return iter(self.info)
+
+    def __len__(self):
+        return len(self.info)
+
+    def get_release(self, release):
+        return self.releases.get(release)
+
+    def get_package(self, name):
+        return self.names.get(name)
+
+    def find_package(self, package, strict=False):
+        # same matching as find_package() using indexes
+        pkg = self.names.get(package)
+        if pkg:
+            return pkg
+        ps = strip_project_url(package)
+        matches = [i for i in (self.projects.get(ps), self.upstreams.get(ps))
+                   if i is not None]
+        if matches:
+            return self.packages[min(matches)]
+        if strict:
+            return None
+        psl = ps.lower()
+        if re.search(r'\W', ps):
+            i = self._find_project_in(psl)
+            if i is not None:
+                return self.packages[i]
+        for i in self._iter_names_containing(psl):
+            return self.packages[i]
+        return None
+
+    def search_packages(self, text, limit=None):
+        """
+        Return packages with name containing text (case insensitive)
+        ranked by exact match, prefix match, name length and info order.
+
+        :param text: text to search for
+        :param limit: return at most this many packages
+        """
+        text = text.lower()
+        names = self.lower_names
+        matches = sorted(
+            self._iter_names_containing(text),
+            key=lambda i: (names[i] != text, not names[i].startswith(text),
+                           len(names[i]), i))
+        return [self.packages[i] for i in matches[:limit]]
+
+    def _build_ngrams(self):
+        # n-gram indexes for best effort search built on first use
+        name_ngrams = {}
+        for i, name in enumerate(self.lower_names):
+            if name is not None:
+                for ngram in _get_ngrams(name):
+                    name_ngrams.setdefault(ngram, set()).add(i)
+        project_ngrams = {}
+        short_projects = []
+        for i, project in enumerate(self.lower_projects):
+            if project is None:
+                continue
+            if len(project) < NGRAM_SIZE:
+                short_projects.append((i, project))
+            else:
+                # project in text needs its first n-gram in text
+                project_ngrams.setdefault(project[:NGRAM_SIZE], []).append(
+                    (i, project))
+        self.name_ngrams = name_ngrams
+        self.project_ngrams = project_ngrams
+        self.short_projects = short_projects
+
+    def _find_project_in(self, text):
+        # index of first package with project contained in text
+        if self.name_ngrams is None:
+            self._build_ngrams()
+        first = None
+        for i, project in self.short_projects:
+            if project in text:
+                first = i
+                break
+        for pos in range(len(text) - NGRAM_SIZE + 1):
+            ngram = text[pos:pos + NGRAM_SIZE]
+            for i, project in self.project_ngrams.get(ngram, ()):
+                if first is not None and i >= first:
+                    break
+                if text.startswith(project, pos):
+                    first = i
+                    break
+        return first
+
+    def _iter_names_containing(self, text):
+        # indexes of packages with name containing text in info order
+        if len(text) < NGRAM_SIZE:
+            candidates = range(len(self.lower_names))
+        else:
+            if self.name_ngrams is None:
+                self._build_ngrams()
+            postings = sorted((self.name_ngrams.get(ngram, ())
+                               for ngram in _get_ngrams(text)), key=len)
+            candidates = sorted(set(postings[0]).intersection(*postings[1:]))
+        names = self.lower_names
+        for i in candidates:
+            if names[i] is not None and text in names[i]:
+                yield i
+
+
 def find_element(info, needle, info_key='osp_releases'):
     '''Find a matching needle in a custom list of dict'''
     if info_key not in info:
@@ -94,40 +276,90 @@ def __find_element(data, needle):
 
 
 def filter_pkgs(pkgs, rexen):
-    filter_wrapper = partial(_match_pkg, rexen)
-    return list(filter(filter_wrapper, pkgs))
+    """
+    Return packages matching all {attribute: regex} filters in rexen.
+
+    Regex is searched in attribute value or in any item of a collection
+    attribute, "~" prefix negates the match. Packages without filtered
+    attribute never match.
+    """
+    return list(filter(compile_filter(rexen), pkgs))
 
 
 def _match_pkg(rexen, pkg):
-    for attr, rex in rexen.items():
-        exclusion = False
-        if rex[0] == "~":
-            exclusion = True
-            rex = rex[1:]
-        val = pkg.get(attr)
-        if val is None:
-            return False
-        if isinstance(val, six.string_types):
-            if exclusion is False and not re.search(rex, val):
-                return False
-            if exclusion is True and re.search(rex, val):
-                return False
-        elif isinstance(val, Iterable):
-            # collection matches if any item of collection matches
-            found = False
-            for e in val:
-                if re.search(rex, e):
-                    found = True
-                    break
-            if found is False and exclusion is False:
+    return compile_filter(rexen)(pkg)
+
+
+# regex special characters, patterns without them are plain substrings
+REGEX_META_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def compile_filter(rexen):
+    """
+    Return PackageFilter for rexen, compiled filters are cached.
+    """
+    try:
+        return _compile_filter(tuple(rexen.items()))
+    except TypeError:
+        # unhashable filter
+        return PackageFilter(rexen)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_filter(items):
+    return PackageFilter(dict(items))
+
+
+class PackageFilter(object):
+    """
+    Package filter predicate compiled from rexen, see filter_pkgs()
+
+    Regexes are compiled once and patterns without regex special
+    characters are matched as plain substrings. Substring matches are
+    evaluated before regex ones and inclusions before exclusions as they
+    are cheaper and usually more selective.
+    """
+    def __init__(self, rexen):
+        matchers = []
+        for attr, rex in rexen.items():
+            exclusion = False
+            if rex[:1] == "~":
+                exclusion = True
+                rex = rex[1:]
+            if REGEX_META_CHARS.isdisjoint(rex):
+                literal, search = rex, None
+            else:
+                literal, search = None, re.compile(rex).search
+            matchers.append((attr, exclusion, literal, search))
+        matchers.sort(key=lambda m: (m[2] is None, m[1]))
+        self.matchers = matchers
+
+    def __call__(self, pkg):
+        for attr, exclusion, literal, search in self.matchers:
+            val = pkg.get(attr)
+            if val is None:
                 return False
-            elif found is True and exclusion is True:
+            if isinstance(val, six.string_types):
+                if literal is not None:
+                    matched = literal in val
+                else:
+                    matched = search(val)
+            elif isinstance(val, Iterable):
+                # collection matches if any item of collection matches
+                if literal is not None:
+                    matched = any(literal in e for e in val)
+                else:
+                    matched = any(map(search, val))
+            else:
+                raise exception.InvalidPackageFilter(
+                    why=("Can only filter strings but '%s' is %s"
+                         % (attr, type(val).__name__)))
+            if exclusion:
+                if matched:
+                    return False
+            elif not matched:
                 return False
-        else:
-            raise exception.InvalidPackageFilter(
-                why=("Can only filter strings but '%s' is %s"
-                     % (attr, type(rex).__name__)))
-    return True
+        return True
 
 
 def get_distrepos(info, release, dist=None):
@@ -159,23 +391,15 @@ def get_distrepos(info, release, dist=None):
 
 
 def tags_diff(info1, info2, tagsname='tags'):
-    changedpkgs = []
-    for pkg2 in info2["packages"]:
-        if pkg2 not in info1["packages"]:
-            changedpkgs.append(pkg2)
     diff = []
-    for pkg2 in changedpkgs:
-        foundpkg = False
-        for pkg1 in info1["packages"]:
-            if pkg1['project'] == pkg2['project']:
-                foundpkg = True
-                break
+    for pkg2, pkg1 in _changed_packages(info1, info2):
         updated_tags = []
-        if foundpkg:
+        if pkg1 is not None:
+            tags1 = pkg1.get(tagsname, {})
             for tag in pkg2.get(tagsname, {}):
                 # use address of this function to differentiate
                 # between missing tag and tag: None
-                tag1 = pkg1.get(tagsname, {}).get(tag, tags_diff)
+                tag1 = tags1.get(tag, tags_diff)
                 if pkg2[tagsname][tag] != tag1:
                     updated_tags.append(tag)
         else:
@@ -196,19 +420,10 @@ def attr_diff(info1, info2, attrname):
 
     Returns list of tuples, in the format: ('package-name', 'new-attr-value')
     """
-    changedpkgs = []
-    for pkg2 in info2["packages"]:
-        if pkg2 not in info1["packages"]:
-            changedpkgs.append(pkg2)
     diff = []
-    for pkg2 in changedpkgs:
-        foundpkg = False
-        for pkg1 in info1["packages"]:
-            if pkg1['project'] == pkg2['project']:
-                foundpkg = True
-                break
+    for pkg2, pkg1 in _changed_packages(info1, info2):
         updated_attrs = None
-        if foundpkg:
+        if pkg1 is not None:
             attr1 = pkg1.get(attrname)
             if pkg2.get(attrname) != attr1:
                 updated_attrs = pkg2.get(attrname)
@@ -220,6 +435,78 @@ def attr_diff(info1, info2, attrname):
     return diff
 
 
+def _changed_packages(info1, info2):
+    """
+    Yield (pkg2, pkg1) for packages of info2 which aren't in info1 where
+    pkg1 is the first package of the same project in info1 or None.
+
+    Packages are only compared to info1 packages of the same project
+    as equal packages have the same project. Packages shared between
+    infos (see DistroInfo.refresh_info()) are skipped by identity.
+    """
+    projects1 = {}
+    for pkg1 in info1['packages']:
+        projects1.setdefault(pkg1.get('project'), []).append(pkg1)
+    for pkg2 in info2['packages']:
+        pkgs1 = projects1.get(pkg2.get('project'))
+        if not pkgs1:
+            yield pkg2, None
+        elif pkg2 not in pkgs1:
+            yield pkg2, pkgs1[0]
+
+
+def info_diff(info1, info2):
+    """
+    Return structural differences between two parsed infos.
+
+    Packages are matched by project and releases by name.
+
+       :param info1: initial info to compare with
+       :param info2: target info to compare
+
+    Returns a dict with 'packages' and 'releases' keys each containing a
+    dict with 'added' and 'removed' lists of (package) names and 'changed'
+    list of tuples in the format: ('package-name', ['changed', 'keys'])
+    """
+    return {
+        'packages': _items_diff(info1['packages'], info2['packages'],
+                                'project', 'name'),
+        'releases': _items_diff(info1['releases'], info2['releases'],
+                                'name', 'name'),
+    }
+
+
+def _items_diff(items1, items2, key, label):
+    if isinstance(items1, Mapping):
+        items1 = items1.values()
+    if isinstance(items2, Mapping):
+        items2 = items2.values()
+    index1 = {}
+    for item1 in items1:
+        index1.setdefault(item1.get(key), item1)
+    keys2 = set()
+    added = []
+    changed = []
+    for item2 in items2:
+        item_key = item2.get(key)
+        keys2.add(item_key)
+        item1 = index1.get(item_key)
+        if item1 is None:
+            added.append(item2.get(label))
+        elif item1 is not item2 and item1 != item2:
+            # items shared between infos are skipped by identity above
+            changed_keys = sorted(
+                k for k in set(item1) | set(item2)
+                if item1.get(k, _missing) != item2.get(k, _missing))
+            changed.append((item2.get(label), changed_keys))
+    removed = [item1.get(label) for item_key, item1 in index1.items()
+               if item_key not in keys2]
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+_missing = object()
+
+
 def strip_project_url(url):
     """strip proto:// | openstack/ prefixes and .git | -distgit suffixes"""
     m = re.match(r'(?:[^:]+://)?(.*)', url)
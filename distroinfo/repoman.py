@@ -12,10 +12,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import errno
 import logging
 import os
 import re
 import shutil
+import subprocess
+import threading
 import time
 
 from distroinfo import exception
@@ -27,18 +30,45 @@ log = logging.getLogger("distroinfo")
 
 
 class GitRepoManager(object):
+    """
+    Manage a local clone of a git repo.
+
+    With checkout=False, the repo is cloned without checking out a worktree
+    and fetch only updates remote refs. Use GitBlobReader to read files.
+
+    Clone and fetch can be limited to save bandwidth and disk space:
+
+    * depth: only fetch this many commits of history (shallow clone)
+    * clone_filter: partial clone filter such as 'blob:none' which only
+      downloads file contents when needed
+    * sparse: only check out top-level files and files explicitly
+      added using add_sparse_path()
+
+    sync() holds a lock file (.lock suffix) next to the repo so that only
+    one process updates a shared repo at a time and clone() replaces the
+    repo directory only after the new clone is complete.
+    """
     repo_desc = u'git'
 
     def __init__(self,
                  base_path,
                  url,
                  repo_dir_postfix=None,
-                 ttl=None):
+                 ttl=None,
+                 checkout=True,
+                 depth=None,
+                 clone_filter=None,
+                 sparse=False):
         self.base_path = os.path.abspath(base_path)
         self.url = url
         self.repo_dir_postfix = repo_dir_postfix
         _, _, self.repo_name = url.rpartition('/')
         self.ttl = ttl
+        self.checkout = checkout
+        self.depth = depth
+        self.clone_filter = clone_filter
+        self.sparse = sparse
+        self.sparse_lock = threading.Lock()
         if not self.repo_name:
             raise exception.RepoError(
                 what=u"Failed to parse %s repo URL: %s" % (self.repo_desc,
@@ -58,7 +88,31 @@ class GitRepoManager(object):
                      space=len(self.repo_desc) * ' ',
                      url=self.url,
                      path=self.repo_path))
-        git('clone', self.url, self.repo_path)
+        cmd = ['clone']
+        if not self.checkout or self.sparse:
+            cmd.append('--no-checkout')
+        if self.depth:
+            cmd += ['--depth', str(self.depth)]
+        if self.clone_filter:
+            cmd.append('--filter=%s' % self.clone_filter)
+        tmp_path = '%s.tmp-%d' % (self.repo_path, os.getpid())
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        try:
+            git(*(cmd + [self.url, tmp_path]))
+            if self.checkout and self.sparse:
+                git('sparse-checkout', 'set', '--no-cone', cwd=tmp_path)
+                git('checkout', 'master', cwd=tmp_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        # replace old repo (if any) only after successful clone
+        old_path = None
+        if os.path.exists(self.repo_path):
+            old_path = '%s.old-%d' % (self.repo_path, os.getpid())
+            os.rename(self.repo_path, old_path)
+        os.rename(tmp_path, self.repo_path)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
 
     def get_last_fetch_time(self):
         path = os.path.join(self.repo_path, '.git/FETCH_HEAD')
@@ -72,30 +126,33 @@ class GitRepoManager(object):
 
     def fetch(self, force=False):
         need_fetch = True
-        with self.repo_dir():
-            delta = 0
-            if not force and self.ttl:
-                try:
-                    # caching enabled, check for last repo fetch
-                    t_fetch = self.get_last_fetch_time()
-                    delta = int(time.time()) - t_fetch
-                    if delta < self.ttl:
-                        need_fetch = False
-                        log.info(u"Existing %s repo is fresh enough, "
-                                 u"it was fetched %d s ago: %s" % (
-                                     self.repo_desc, delta, self.repo_path))
-                    else:
-                        log.info(u"Existing %s repo is too old, "
-                                 u"it was fetched %d s ago: %s" % (
-                                     self.repo_desc, delta, self.repo_path))
-                except Exception as e:
-                    raise e
-            if need_fetch:
-                log.info(u"Fetching %s repo: %s" % (self.repo_desc,
-                                                    self.repo_path))
-                git('fetch', 'origin')
-                git('checkout', '-f', 'master')
-                git('reset', '--hard', 'origin/master')
+        delta = 0
+        if not force and self.ttl:
+            try:
+                # caching enabled, check for last repo fetch
+                t_fetch = self.get_last_fetch_time()
+                delta = int(time.time()) - t_fetch
+                if delta < self.ttl:
+                    need_fetch = False
+                    log.info(u"Existing %s repo is fresh enough, "
+                             u"it was fetched %d s ago: %s" % (
+                                 self.repo_desc, delta, self.repo_path))
+                else:
+                    log.info(u"Existing %s repo is too old, "
+                             u"it was fetched %d s ago: %s" % (
+                                 self.repo_desc, delta, self.repo_path))
+            except Exception as e:
+                raise e
+        if need_fetch:
+            log.info(u"Fetching %s repo: %s" % (self.repo_desc,
+                                                self.repo_path))
+            cmd = ['fetch']
+            if self.depth:
+                cmd += ['--depth', str(self.depth)]
+            self.git(*(cmd + ['origin']))
+            if self.checkout:
+                self.git('checkout', '-f', 'master')
+                self.git('reset', '--hard', 'origin/master')
 
     def repo_dir(self):
         """
@@ -107,13 +164,54 @@ class GitRepoManager(object):
         to temporarily set current directory to repo path"""
         return helpers.cdir(self.repo_path)
 
+    def git(self, *cmd):
+        """Run git command in repo path"""
+        return git(*cmd, cwd=self.repo_path)
+
+    def get_head(self):
+        return self.git('rev-parse', 'HEAD').strip()
+
+    def get_commit(self, rev):
+        """
+        Return commit SHA of supplied revision, raise CommandFailed if it
+        isn't available.
+        """
+        return self.git('rev-parse', '--verify', '--quiet',
+                        '%s^{commit}' % rev).strip()
+
+    def get_tree(self, rev):
+        """
+        Return dict of file path: blob SHA of all files in revision.
+        """
+        tree = {}
+        for entry in self.git('ls-tree', '-r', '-z', rev).split('\0'):
+            if not entry:
+                continue
+            meta, _, path = entry.partition('\t')
+            _, obj_type, sha = meta.split()
+            if obj_type == 'blob':
+                tree[path] = sha
+        return tree
+
     def get_file_path(self, fn):
         return os.path.join(self.repo_path, fn)
 
+    def add_sparse_path(self, fn):
+        """
+        Make sure file is checked out in a sparse checkout.
+        """
+        if not self.sparse or not self.checkout:
+            return
+        with self.sparse_lock:
+            if os.path.exists(self.get_file_path(fn)):
+                return
+            log.info(u"Adding file to sparse %s repo: %s" % (self.repo_desc,
+                                                             fn))
+            self.git('sparse-checkout', 'add', '/' + fn)
+
     def check_remote(self):
         assert self.url
-        with self.repo_dir():
-            remotes = git('remote', '-v')
+        remotes = self.git('remote', '-v')
         pattern = r'^origin\s+%s\s+\(fetch\)$' % re.escape(self.url)
         if not re.search(pattern, remotes, re.MULTILINE):
             raise exception.RepoError(what="origin isn't set to expected URL: "
@@ -127,15 +225,83 @@ class GitRepoManager(object):
         if self.base_path and not os.path.isdir(self.base_path):
             log.info(u"Creating base directory: %s" % self.base_path)
             os.makedirs(self.base_path)
-        if not os.path.isdir(self.repo_path):
-            self.clone()
-        else:
-            try:
-                self.check_remote()
-            except exception.RepoError as e:
-                log.warn(u"%s repo didn't pass the checks, renewing: %s"
-                         % (self.repo_desc, e))
-                self.nuke()
+        with helpers.file_lock(self.repo_path + '.lock'):
+            if not os.path.isdir(self.repo_path):
                 self.clone()
             else:
-                self.fetch(force=force_fetch)
+                try:
+                    self.check_remote()
+                except exception.RepoError as e:
+                    log.warn(u"%s repo didn't pass the checks, renewing: %s"
+                             % (self.repo_desc, e))
+                    self.clone()
+                else:
+                    self.fetch(force=force_fetch)
+
+
+class GitBlobReader(object):
+    """
+    Read files from git object store of a repo without a worktree.
+
+    A single persistent `git cat-file --batch` process is used for all
+    reads, call close() when done.
+    """
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.lock = threading.Lock()
+        self.prc = None
+
+    def start(self):
+        try:
+            self.prc = subprocess.Popen(['git', 'cat-file', '--batch'],
+                                        cwd=self.repo_path,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        except OSError:
+            raise exception.CommandNotFound(cmd='git')
+
+    def read(self, rev, fn):
+        """
+        Return contents of file fn in revision rev as bytes.
+
+        Raise IOError when the file doesn't exist in rev.
+        """
+        obj = u'%s:%s\n' % (rev, fn)
+        with self.lock:
+            if not self.prc:
+                self.start()
+            self.prc.stdin.write(obj.encode('utf-8'))
+            self.prc.stdin.flush()
+            header = self.prc.stdout.readline().decode('utf-8')
+            if not header:
+                self.close()
+                raise exception.RepoError(
+                    what=u"git cat-file exited unexpectedly: %s"
+                         % self.repo_path)
+            # <object> missing (or ambiguous) where object contains fn
+            # which can contain spaces, only found objects end with size
+            parts = header.rstrip('\n').split(' ')
+            if len(parts) != 3 or not parts[2].isdigit():
+                raise IOError(errno.ENOENT,
+                              u"No such file in git revision %s" % rev, fn)
+            _, obj_type, size = parts
+            data = self.prc.stdout.read(int(size))
+            # each object is followed by a LF
+            self.prc.stdout.read(1)
+        if obj_type != 'blob':
+            raise IOError(errno.EISDIR,
+                          u"Not a file in git revision %s" % rev, fn)
+        return data
+
+    def close(self):
+        if self.prc:
+            self.prc.stdin.close()
+            self.prc.stdout.close()
+            self.prc.wait()
+            self.prc = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
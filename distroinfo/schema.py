@@ -0,0 +1,504 @@
+# Copyright (c) 2019 Red Hat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Declarative info schema compiled into validator functions.
+
+Schema is described using Node classes below, compile_node() turns a
+schema into a validator function(value, path, errors) which appends
+SchemaViolation exceptions to errors list instead of raising them so that
+all violations are reported at once.
+
+None values in mappings are treated as unset as that's what they mean
+when merging infos.
+"""
+
+import six
+
+from distroinfo import exception
+from distroinfo import parse
+
+
+def format_path(path):
+    """
+    Format path tuple of a value: ('rdo.yml', 'packages', (3, 'nova'),
+    'maintainers') is formatted as 'rdo.yml: packages[nova].maintainers'
+    """
+    if not path:
+        return ''
+    out = ''
+    for part in path[1:]:
+        if isinstance(part, tuple):
+            index, label = part
+            out += '[%s]' % (index if label is None else label)
+        elif out:
+            out += '.%s' % part
+        else:
+            out = six.text_type(part)
+    if path[0] is None:
+        return out
+    if not out:
+        return six.text_type(path[0])
+    return u'%s: %s' % (path[0], out)
+
+
+def violation(path, why):
+    return exception.SchemaViolation(path=format_path(path), why=why)
+
+
+def _type_name(value):
+    if value is None:
+        return 'null'
+    return type(value).__name__
+
+
+def compile_node(node):
+    """
+    Compile schema node into validator function(value, path, errors).
+
+    None is returned for nodes accepting anything.
+    """
+    if node is None or isinstance(node, Any):
+        return None
+    return node.compile()
+
+
+class Node(object):
+    """
+    Base schema node
+    """
+    def compile(self):
+        raise NotImplementedError()
+
+
+class Any(Node):
+    """
+    Any value
+    """
+
+
+class Type(Node):
+    """
+    Value of specific type(s)
+    """
+    types = ()
+    type_name = None
+
+    def compile(self):
+        types = self.types
+        type_name = self.type_name
+
+        def validate(value, path, errors):
+            if not isinstance(value, types):
+                errors.append(violation(path, "expected %s, got %s" % (
+                    type_name, _type_name(value))))
+        return validate
+
+
+class Str(Type):
+    types = six.string_types
+    type_name = 'string'
+
+
+class Bool(Type):
+    types = (bool,)
+    type_name = 'boolean'
+
+
+class Email(Node):
+    """
+    Email address
+    """
+    def compile(self):
+        def validate(value, path, errors):
+            if not isinstance(value, six.string_types) or '@' not in value:
+                errors.append(violation(
+                    path, "'%s' doesn't look like an email" % (value,)))
+        return validate
+
+
+class OneOf(Node):
+    """
+    Value matching at least one of supplied nodes
+    """
+    def __init__(self, *nodes):
+        self.nodes = nodes
+
+    def compile(self):
+        validators = [compile_node(node) for node in self.nodes]
+        if None in validators:
+            return None
+
+        def validate(value, path, errors):
+            whys = []
+            for validator in validators:
+                node_errors = []
+                validator(value, path, node_errors)
+                if not node_errors:
+                    return
+                whys.append(node_errors[0].why)
+            errors.append(violation(path, ' or '.join(whys)))
+        return validate
+
+
+class List(Node):
+    """
+    List of items
+
+    :param item: schema node of items
+    :param label: key of dict items to identify them by in paths
+    :param min_items: minimal number of items
+    """
+    def __init__(self, item=None, label=None, min_items=0):
+        self.item = item
+        self.label = label
+        self.min_items = min_items
+
+    def compile(self):
+        validate_item = compile_node(self.item)
+        label = self.label
+        min_items = self.min_items
+
+        def validate(value, path, errors):
+            if not isinstance(value, list):
+                errors.append(violation(
+                    path, "expected list, got %s" % _type_name(value)))
+                return
+            if len(value) < min_items:
+                errors.append(violation(
+                    path, "at least %d item(s) required" % min_items))
+            if validate_item is None:
+                return
+            for i, item in enumerate(value):
+                name = None
+                if label is not None and isinstance(item, dict):
+                    name = item.get(label)
+                validate_item(item, path + ((i, name),), errors)
+        return validate
+
+
+class Mapping(Node):
+    """
+    Mapping of arbitrary keys to values
+
+    :param value: schema node of values
+    """
+    def __init__(self, value=None):
+        self.value = value
+
+    def compile(self):
+        validate_value = compile_node(self.value)
+
+        def validate(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(violation(
+                    path, "expected mapping, got %s" % _type_name(value)))
+                return
+            if validate_value is None:
+                return
+            for key, val in value.items():
+                if val is not None:
+                    validate_value(val, path + (key,), errors)
+        return validate
+
+
+class Collection(Node):
+    """
+    List of items or a mapping of items such as packages or releases
+    with info_dicts=True
+
+    :param item: schema node of items
+    :param label: key of dict items to identify them by in paths
+    """
+    def __init__(self, item=None, label=None):
+        self.item = item
+        self.label = label
+
+    def compile(self):
+        validate_list = List(self.item, label=self.label).compile()
+        validate_mapping = Mapping(self.item).compile()
+
+        def validate(value, path, errors):
+            if isinstance(value, dict):
+                validate_mapping(value, path, errors)
+            else:
+                validate_list(value, path, errors)
+        return validate
+
+
+class Dict(Node):
+    """
+    Mapping with known fields
+
+    :param fields: dict of field: schema node
+    :param required: fields which need to be set
+    :param extra: schema node of other fields, None to disallow them
+    :param check: function(value, path, errors) for additional checks
+    """
+    def __init__(self, fields=None, required=(), extra=None, check=None):
+        self.fields = fields or {}
+        self.required = required
+        self.extra = extra
+        self.check = check
+
+    def compile(self):
+        field_validators = []
+        for field, node in self.fields.items():
+            validator = compile_node(node)
+            if validator is not None:
+                field_validators.append((field, validator))
+        fields = self.fields
+        required = tuple(self.required)
+        allow_extra = self.extra is not None
+        validate_extra = compile_node(self.extra)
+        check = self.check
+
+        def validate(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(violation(
+                    path, "expected mapping, got %s" % _type_name(value)))
+                return
+            for field in required:
+                if value.get(field) is None:
+                    errors.append(violation(path + (field,),
+                                            "required item missing"))
+            for field, validator in field_validators:
+                val = value.get(field)
+                if val is not None:
+                    validator(val, path + (field,), errors)
+            if not allow_extra or validate_extra is not None:
+                for field, val in value.items():
+                    if field in fields or val is None:
+                        continue
+                    if not allow_extra:
+                        errors.append(violation(path + (field,),
+                                                "unexpected item"))
+                    else:
+                        validate_extra(val, path + (field,), errors)
+            if check is not None:
+                check(value, path, errors)
+        return validate
+
+
+def check_repos_branch(rls, path, errors):
+    # repos without branch inherit it from release
+    if rls.get('branch') is not None:
+        return
+    repos = rls.get('repos')
+    if not isinstance(repos, list):
+        return
+    for i, repo in enumerate(repos):
+        if isinstance(repo, dict) and repo.get('branch') is None:
+            errors.append(violation(
+                path + ('repos', (i, repo.get('name')), 'branch'),
+                "required item missing and release has no branch"))
+
+
+PACKAGE_FIELDS = {
+    'name': Str(),
+    'project': Str(),
+    'conf': Str(),
+    'maintainers': List(Email()),
+    'tags': Mapping(Dict(extra=Any())),
+}
+# package entry of an info file, it might only add to other entries
+PACKAGE_ENTRY = Dict(PACKAGE_FIELDS, required=['project'], extra=Any())
+# resolved package
+PACKAGE = Dict(dict(PACKAGE_FIELDS, maintainers=List(Email(), min_items=1)),
+               required=['name', 'project', 'maintainers'], extra=Any())
+
+REPO = Dict({
+    'name': Str(),
+    'branch': Str(),
+}, required=['name'], extra=Any())
+RELEASE_FIELDS = {
+    'name': Str(),
+    'branch': Str(),
+    'repos': List(REPO, label='name'),
+}
+# release entry of an info file, it might only add to other entries
+RELEASE_ENTRY = Dict(RELEASE_FIELDS, required=['name'], extra=Any())
+# merged release
+RELEASE = Dict(RELEASE_FIELDS, required=['name', 'repos'], extra=Any(),
+               check=check_repos_branch)
+
+# top level sections of an info file
+SECTIONS = {
+    'import': List(OneOf(Str(), Mapping(Str()))),
+    'remote-info': Mapping(Dict(extra=Any())),
+    'releases': Collection(RELEASE_ENTRY, label='name'),
+    'package-default': Dict(PACKAGE_FIELDS, extra=Any()),
+    'package-configs': Mapping(Dict(PACKAGE_FIELDS, extra=Any())),
+    'packages': Collection(PACKAGE_ENTRY, label='project'),
+}
+REQUIRED_SECTIONS = ['releases', 'packages']
+
+
+class InfoSchema(object):
+    """
+    Info schema compiled into validators
+
+    :param sections: dict of custom top level section: schema node,
+                     these can also override default SECTIONS
+    :param extra_sections: allow sections not described by schema
+    """
+    def __init__(self, sections=None, extra_sections=True):
+        file_sections = dict(SECTIONS)
+        if sections:
+            file_sections.update(sections)
+        extra = Any() if extra_sections else None
+        self.validate_file = compile_node(Dict(file_sections, extra=extra))
+        self.validate_release = compile_node(RELEASE)
+        self.validate_package = compile_node(PACKAGE)
+
+    def validate(self, files, apply_tag=None):
+        """
+        Validate info files and info merged from them in one pass.
+
+        Each info file is validated on its own first, then merged
+        releases and resolved packages are validated, their errors are
+        reported with the name of first file defining them. Parts of
+        files which can't be merged (such as packages without project)
+        are left out of the merged info.
+
+        :param files: list of (file name, raw info) tuples in merge order
+        :param apply_tag: tag to apply when resolving packages
+        :returns: list of SchemaViolation exceptions, empty for valid info
+        """
+        errors = []
+        origins = {}
+        raw_infos = []
+        for fn, raw_info in files:
+            self.validate_file(raw_info, (fn,), errors)
+            raw_info = _get_mergeable_info(raw_info)
+            if raw_info is None:
+                continue
+            for section, key in (('releases', 'name'),
+                                 ('packages', 'project')):
+                for item in _iter_items(raw_info.get(section)):
+                    origins.setdefault((section, item.get(key)), fn)
+            raw_infos.append(raw_info)
+
+        try:
+            info = parse.merge_infos(*raw_infos, in_place=False)
+        except Exception as ex:
+            errors.append(violation(
+                (None,), "failed to merge info files: %s" % ex))
+            return _unique_errors(errors)
+        info = dict(info)
+        for section in REQUIRED_SECTIONS:
+            if section not in info:
+                errors.append(violation(
+                    (None, section), "required section missing"))
+
+        for i, rls in enumerate(_iter_items(info.get('releases'))):
+            name = rls.get('name')
+            path = (origins.get(('releases', name)), 'releases', (i, name))
+            self.validate_release(rls, path, errors)
+
+        templates = {}
+        projects = set()
+        for i, pkg in enumerate(_iter_items(info.get('packages'))):
+            project = pkg.get('project')
+            path = (origins.get(('packages', project)), 'packages',
+                    (i, project))
+            if project in projects:
+                errors.append(violation(path, "duplicated project"))
+            projects.add(project)
+            try:
+                pkg = parse.resolve_package(pkg, info, apply_tag=apply_tag,
+                                            templates=templates)
+            except (exception.InvalidInfoFormat,
+                    KeyError, TypeError, ValueError) as ex:
+                # malformed % templates raise ValueError or TypeError
+                errors.append(violation(
+                    path, str(ex) or type(ex).__name__))
+                continue
+            self.validate_package(pkg, path, errors)
+        return _unique_errors(errors)
+
+
+# sections merge_infos() needs to be of specific type
+MERGED_SECTION_TYPES = {
+    'import': list,
+    'remote-info': dict,
+    'releases': (list, dict),
+    'package-default': dict,
+    'package-configs': dict,
+    'packages': (list, dict),
+}
+# key identifying items of sections when merging
+MERGED_SECTION_KEYS = {
+    'releases': 'name',
+    'packages': 'project',
+}
+
+
+def _get_mergeable_info(raw_info):
+    # copy of raw info without parts merge_infos() can't handle
+    if not isinstance(raw_info, dict):
+        return None
+    info = {}
+    for section, value in raw_info.items():
+        section_type = MERGED_SECTION_TYPES.get(section)
+        if section_type and not isinstance(value, section_type):
+            continue
+        key = MERGED_SECTION_KEYS.get(section)
+        if key:
+            items = value.values() if isinstance(value, dict) else value
+            items = [item for item in items if _has_str_key(item, key)]
+            if isinstance(value, dict):
+                value = dict((item[key], item) for item in items)
+            else:
+                value = items
+        info[section] = value
+    return info
+
+
+def _has_str_key(item, key):
+    return isinstance(item, dict) and isinstance(item.get(key),
+                                                 six.string_types)
+
+
+def _unique_errors(errors):
+    # the same violation can be found in a file and in merged info
+    seen = set()
+    unique = []
+    for error in errors:
+        msg = str(error)
+        if msg not in seen:
+            seen.add(msg)
+            unique.append(error)
+    return unique
+
+
+def _iter_items(items):
+    if isinstance(items, dict):
+        items = items.values()
+    for item in items or []:
+        if isinstance(item, dict):
+            yield item
+
+
+_default_schema = None
+
+
+def get_default_schema():
+    """
+    Return default InfoSchema compiled on first use.
+    """
+    global _default_schema
+    if _default_schema is None:
+        _default_schema = InfoSchema()
+    return _default_schema
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+"""
+Usage: bench_merge.py [<info-dir>] [<info-file>]
+
+Benchmark merge_infos() against pairwise folding using _merge() on local
+info (rdoinfo copy from tests by default).
+"""
+# -*- encoding: utf-8 -*-
+from __future__ import print_function
+import os
+import pickle
+import sys
+import timeit
+
+from distroinfo import parse
+from distroinfo.info import DistroInfo
+
+
+def fold_merge(*infos):
+    # merge_infos() implementation before parse.Merger
+    info_dict = parse.info2dicts(infos[0], in_place=True)
+    for info_next in infos[1:]:
+        info_next_dict = parse.info2dicts(info_next, in_place=True)
+        info_dict = parse._merge(info_dict, info_next_dict)
+    return parse.info2lists(info_dict, in_place=True)
+
+
+def bench(fun, data, number=10, repeat=5):
+    def run():
+        fun(*pickle.loads(data))
+
+    def load():
+        pickle.loads(data)
+
+    t_run = min(timeit.repeat(run, number=number, repeat=repeat))
+    t_load = min(timeit.repeat(load, number=number, repeat=repeat))
+    return (t_run - t_load) / number
+
+
+def main(info_dir=None, info_file='rdo-full.yml'):
+    if not info_dir:
+        info_dir = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                                'assets', 'info', 'rdoinfo')
+    di = DistroInfo(info_file, local_info=info_dir)
+    infos = di.fetcher.fetch(info_file)
+    data = pickle.dumps(infos, protocol=pickle.HIGHEST_PROTOCOL)
+    assert fold_merge(*pickle.loads(data)) == parse.merge_infos(
+        *pickle.loads(data))
+    print("merging %d info files" % len(infos))
+    t_fold = bench(fold_merge, data)
+    t_merge = bench(parse.merge_infos, data)
+    print("_merge fold:   %.1f ms" % (t_fold * 1000))
+    print("merge_infos(): %.1f ms (%.1fx)" % (t_merge * 1000,
+                                              t_fold / t_merge))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
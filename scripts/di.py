@@ -2,6 +2,8 @@
 """
 Usage: di.py fetch [-C <cache-dir>] [-f remote|git|local] <info-url> <info-file>...
        di.py dump [-y <out.yaml>] [-j <out.json>] [-C <cache-dir>] [-f remote|git|local] <info-url> <info-file>...
+       di.py validate [-t <tag>] [-C <cache-dir>] [-f remote|git|local] <info-url> <info-file>...
+       di.py diff [-t <tag>] [-C <cache-dir>] <info-url> <old-rev> <new-rev> <info-file>...
        di.py --help | --version
 
 Fetch, parse and dump remote distroinfo metadata.
@@ -9,10 +11,14 @@ Fetch, parse and dump remote distroinfo metadata.
 Commands:
   fetch        fetch specified info into <cache-dir>
   dump         dump parsed info as YAML and/or JSON
+  validate     check info against schema reporting all violations
+  diff         show changes between two git revisions of info repo
 
 Arguments:
   <info-url>   distroinfo repo URL
   <info-file>  info file(s) to parse
+  <old-rev>    git revision to compare with
+  <new-rev>    git revision to compare, branch names refer to origin/<branch>
 
 Options:
   -f, --fetcher remote|git|local
@@ -20,6 +26,7 @@ Options:
   -y, --yaml-out <out.yaml>  dump parsed info into specified YAML file
   -j, --json-out <out.json>  dump parsed info into specified YAML file
   -C, --cache-dir <dir>      directory to store cached distroinfo metadata
+  -t, --tag <tag>            apply tag to packages
   --version                  show distroinfo version
   -h, --help                 show usage help
 """  # noqa
@@ -92,6 +99,30 @@ def dump(info_url, info_files, fetcher=None, cache_dir=None,
     return 0
 
 
+def validate(info_url, info_files, fetcher=None, cache_dir=None,
+             tag=None):
+    di = get_distroinfo(info_url, info_files,
+                        fetcher=fetcher, cache_dir=cache_dir)
+    di.validate(apply_tag=tag)
+    print("Info is valid.")
+    return 0
+
+
+def diff(info_url, info_files, old_rev, new_rev, cache_dir=None, tag=None):
+    di = get_distroinfo(info_url, info_files,
+                        fetcher='git', cache_dir=cache_dir)
+    info_diff = di.diff_revisions(old_rev, new_rev, apply_tag=tag)
+    for section, kind in (('packages', 'package'), ('releases', 'release')):
+        changes = info_diff[section]
+        for name in changes['added']:
+            print("+ %s: %s" % (kind, name))
+        for name in changes['removed']:
+            print("- %s: %s" % (kind, name))
+        for name, keys in changes['changed']:
+            print("~ %s: %s: %s" % (kind, name, ", ".join(keys)))
+    return 0
+
+
 def distroinfo(cargs, version=__version__):
     """
     distroinfo Command-Line Interface
@@ -121,8 +152,25 @@ def distroinfo(cargs, version=__version__):
                 cache_dir=args['--cache-dir'],
                 fetcher=args['--fetcher'],
             )
+        elif args['diff']:
+            code = diff(
+                info_url=args['<info-url>'],
+                info_files=args['<info-file>'],
+                old_rev=args['<old-rev>'],
+                new_rev=args['<new-rev>'],
+                tag=args['--tag'],
+                cache_dir=args['--cache-dir'],
+            )
+        elif args['validate']:
+            code = validate(
+                info_url=args['<info-url>'],
+                info_files=args['<info-file>'],
+                tag=args['--tag'],
+                cache_dir=args['--cache-dir'],
+                fetcher=args['--fetcher'],
+            )
     except (
-            exception.InvalidInfoFormat,
+            exception.DistroInfoException,
             KeyboardInterrupt,
     ) as ex:
         code = getattr(ex, 'exit_code', code)
@@ -1,8 +1,16 @@
+import contextlib
+import functools
 import io
 import os
 import logging
+import shutil
+import threading
+
+from six.moves import BaseHTTPServer
+from six.moves import SimpleHTTPServer
 
 from distroinfo import query
+from distroinfo.helpers import git
 
 
 ASSETS_PATH = os.path.join(os.path.dirname(__file__), 'assets')
@@ -22,6 +30,57 @@ def capture_distroinfo_logger():
     return log_stream
 
 
+class RecordingHTTPRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    def log_request(self, code='-', size='-'):
+        self.server.requests.append((self.path, int(code)))
+
+
+@contextlib.contextmanager
+def serve_directory(path):
+    """
+    Serve files from path over HTTP on localhost.
+
+    Yields the server with base URL in server.url and list of served
+    (path, status code) tuples in server.requests.
+    """
+    handler = functools.partial(RecordingHTTPRequestHandler, directory=path)
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), handler)
+    server.requests = []
+    server.url = 'http://127.0.0.1:%d/' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def create_git_repo(src_path, path):
+    """
+    Create a bare git repo in path with contents of src_path
+    committed to master branch and return its URL.
+    """
+    work_path = path + '-work'
+    shutil.copytree(src_path, work_path)
+    git('init', '-q', '-b', 'master', cwd=work_path)
+    commit_git_repo(work_path)
+    git('clone', '-q', '--bare', work_path, path)
+    git('remote', 'add', 'origin', path, cwd=work_path)
+    return path
+
+
+def commit_git_repo(work_path, msg='update'):
+    git('add', '-A', cwd=work_path)
+    git('-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+        'commit', '-q', '-m', msg, cwd=work_path)
+
+
+def push_git_repo(work_path):
+    git('push', '-q', 'origin', 'master', cwd=work_path)
+
+
 def assert_dict_contains(tested, expected):
     for key, val in expected.items():
         assert key in tested
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+
+from distroinfo import async_fetch
+from distroinfo import exception
+from distroinfo.info import DistroInfo
+
+import tests.test_common as common
+
+
+def test_async_local_info():
+    path = common.get_test_info_path('rdoinfo')
+    di = DistroInfo('rdo-full.yml', local_info=path, fetch_workers=4)
+    assert isinstance(di.async_fetcher, async_fetch.AsyncLocalInfoFetcher)
+    raw_infos = di.fetcher.fetch('rdo-full.yml')
+    async_raw_infos = asyncio.run(di.async_fetcher.fetch('rdo-full.yml'))
+    assert async_raw_infos == raw_infos
+    info = asyncio.run(di.get_info_async())
+    common.assert_rdoinfo_full(info)
+
+
+def test_async_remote_info_import():
+    di = DistroInfo('remote.yml',
+                    local_info=common.get_test_info_path('minimal'))
+    info = asyncio.run(di.get_info_async())
+    assert info == di.get_info()
+
+
+def test_async_circular_import():
+    di = DistroInfo('circle1.yml',
+                    local_info=common.get_test_info_path('broken'))
+    with pytest.raises(exception.CircularInfoInclude):
+        asyncio.run(di.get_info_async())
+
+
+def test_async_remote_fetch(tmpdir):
+    path = common.get_test_info_path('minimal')
+    with common.serve_directory(path) as server:
+        di = DistroInfo('minimal.yml',
+                        remote_info=server.url,
+                        cache_base_path=str(tmpdir))
+        assert isinstance(di.async_fetcher,
+                          async_fetch.AsyncRemoteInfoFetcher)
+        info = asyncio.run(di.get_info_async())
+        assert len(server.requests) == 4
+        # cache is shared with blocking fetcher
+        assert di.get_info() == info
+        assert len(server.requests) == 4
+
+
+def test_async_git_fetch(tmpdir):
+    url = common.create_git_repo(common.get_test_info_path('minimal'),
+                                 str(tmpdir.join('info.git')))
+    di = DistroInfo('minimal.yml',
+                    remote_git_info=url,
+                    cache_base_path=str(tmpdir.join('cache')))
+    assert isinstance(di.async_fetcher,
+                      async_fetch.AsyncRemoteGitInfoFetcher)
+    info = asyncio.run(di.get_info_async())
+    local_info = DistroInfo('minimal.yml',
+                            local_info=di.fetcher.cache_path).get_info()
+    assert info == local_info
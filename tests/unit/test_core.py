@@ -1,6 +1,8 @@
 from distroinfo import exception
 from distroinfo.info import DistroInfo
+import os
 import pytest
+import shutil
 
 import tests.test_common as common
 
@@ -31,3 +33,94 @@ def test_self_import():
                     local_info=common.get_test_info_path('broken'))
     with pytest.raises(exception.CircularInfoInclude):
         info = di.get_info()
+
+
+def test_concurrent_fetch_order():
+    path = common.get_test_info_path('rdoinfo')
+    di = DistroInfo('rdo-full.yml', local_info=path)
+    di_concurrent = DistroInfo('rdo-full.yml', local_info=path,
+                               fetch_workers=8)
+    raw_infos = di.fetcher.fetch('rdo-full.yml')
+    raw_infos_concurrent = di_concurrent.fetcher.fetch('rdo-full.yml')
+    assert raw_infos_concurrent == raw_infos
+    # a file imported multiple times must not be shared
+    ids = set(id(i) for i in raw_infos_concurrent)
+    assert len(ids) == len(raw_infos_concurrent)
+
+
+def test_concurrent_remote_info():
+    path = common.get_test_info_path('minimal')
+    info = DistroInfo('remote.yml', local_info=path).get_info()
+    di_concurrent = DistroInfo('remote.yml', local_info=path,
+                               fetch_workers=4)
+    assert di_concurrent.get_info() == info
+
+
+def test_concurrent_circular_import():
+    di = DistroInfo('circle1.yml',
+                    local_info=common.get_test_info_path('broken'),
+                    fetch_workers=4)
+    with pytest.raises(exception.CircularInfoInclude):
+        di.get_info()
+
+
+def test_concurrent_self_import():
+    di = DistroInfo('self.yml',
+                    local_info=common.get_test_info_path('broken'),
+                    fetch_workers=4)
+    with pytest.raises(exception.CircularInfoInclude):
+        di.get_info()
+
+
+def test_concurrent_invalid_import():
+    di = DistroInfo('invalid-import.yml',
+                    local_info=common.get_test_info_path('broken'),
+                    fetch_workers=4)
+    with pytest.raises(IOError):
+        di.get_info()
+
+
+def test_result_cache(tmpdir):
+    path = str(tmpdir.join('minimal'))
+    shutil.copytree(common.get_test_info_path('minimal'), path)
+    di = DistroInfo('minimal.yml', local_info=path, result_cache_size=2)
+    info = di.get_info()
+    fetch_calls = []
+    orig_get_info = di._get_info
+
+    def get_info(**kwargs):
+        fetch_calls.append(kwargs)
+        return orig_get_info(**kwargs)
+
+    di._get_info = get_info
+    # unchanged sources return a copy of cached result
+    cached_info = di.get_info()
+    assert cached_info == info
+    assert not fetch_calls
+    cached_info['packages'].pop()
+    assert di.get_info() == info
+    assert not fetch_calls
+    # other arguments are cached separately
+    di.get_info(apply_tag='queens')
+    di.get_info(info_dicts=True)
+    assert len(fetch_calls) == 2
+    assert len(di.result_cache) == 2
+    # changed source invalidates cached result
+    with open(os.path.join(path, 'releases.yml'), 'a') as f:
+        f.write('- name: stein\n  repos: []\n')
+    info = di.get_info()
+    assert len(fetch_calls) == 3
+    assert [r['name'] for r in info['releases']] == [
+        'rocky', 'queens', 'stein']
+    di.invalidate_cache()
+    di.get_info()
+    assert len(fetch_calls) == 4
+
+
+def test_result_cache_shared():
+    di = DistroInfo('remote.yml',
+                    local_info=common.get_test_info_path('minimal'),
+                    result_cache_size=1,
+                    result_cache_copy=False)
+    info = di.get_info()
+    assert di.get_info() is info
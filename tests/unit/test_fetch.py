@@ -0,0 +1,379 @@
+import os
+import pytest
+import shutil
+import threading
+import six
+import time
+import yaml
+
+from distroinfo import exception
+from distroinfo import fetch
+from distroinfo import helpers
+from distroinfo.info import DistroInfo
+
+import tests.test_common as common
+
+
+def test_remote_fetch_cache(tmpdir):
+    path = common.get_test_info_path('minimal')
+    with common.serve_directory(path) as server:
+        di = DistroInfo('minimal.yml',
+                        remote_info=server.url,
+                        cache_base_path=str(tmpdir))
+        info = di.get_info()
+        assert len(server.requests) == 4
+        # second fetch is served from cache
+        assert di.get_info() == info
+        assert len(server.requests) == 4
+
+
+def test_remote_fetch_revalidate(tmpdir, monkeypatch):
+    path = common.get_test_info_path('minimal')
+    with common.serve_directory(path) as server:
+        di = DistroInfo('minimal.yml',
+                        remote_info=server.url,
+                        cache_base_path=str(tmpdir))
+        info = di.get_info()
+        assert all(code == 200 for _, code in server.requests)
+        # expire the cache, unchanged files are only revalidated
+        monkeypatch.setattr(helpers, 'get_file_age', lambda path: 10 ** 6)
+        log_stream = common.capture_distroinfo_logger()
+        assert di.get_info() == info
+        assert [code for _, code in server.requests[4:]] == [304] * 4
+        assert 'Remote file not modified' in log_stream.getvalue()
+
+
+def test_remote_fetch_meta(tmpdir):
+    path = common.get_test_info_path('minimal')
+    with common.serve_directory(path) as server:
+        fetcher = fetch.RemoteInfoFetcher(server.url,
+                                          cache_ttl=3600,
+                                          cache_base_path=str(tmpdir))
+        fetcher.get_file_content('releases.yml')
+        cached_path = tmpdir.join(fetch.get_id(server.url), 'releases.yml')
+        meta = fetcher.get_cache_meta(str(cached_path))
+        assert 'Last-Modified' in meta
+
+
+class DictInfoFetcher(fetch.CachedInfoFetcher):
+    def __init__(self, files, *args, **kwargs):
+        super(DictInfoFetcher, self).__init__(*args, **kwargs)
+        self.files = files
+        self.cache_path = os.path.join(self.cache_base_path, 'dict')
+
+    def get_file_content(self, fn):
+        return self.files[fn]
+
+
+def test_data_cache(tmpdir, monkeypatch):
+    files = {'foo.yml': 'packages:\n- project: foo\n'}
+    fetcher = DictInfoFetcher(files, 'dict',
+                              cache_ttl=3600,
+                              cache_base_path=str(tmpdir))
+    data = fetcher.get_file_data('foo.yml')
+    assert data == {'packages': [{'project': 'foo'}]}
+    assert tmpdir.join('dict.data', 'foo.yml.pickle').check()
+
+    def yaml_load(*args, **kwargs):
+        raise AssertionError("YAML parsed despite cached data")
+
+    # unchanged file is loaded from data cache
+    with monkeypatch.context() as m:
+        m.setattr(yaml, 'load', yaml_load)
+        cached_data = fetcher.get_file_data('foo.yml')
+    assert cached_data == data
+    assert cached_data is not data
+    # changed file invalidates data cache
+    files['foo.yml'] = 'packages:\n- project: bar\n'
+    data = fetcher.get_file_data('foo.yml')
+    assert data == {'packages': [{'project': 'bar'}]}
+    assert fetcher.get_file_data('foo.yml') == data
+
+
+def test_data_cache_disabled(tmpdir):
+    files = {'foo.yml': 'packages:\n- project: foo\n'}
+    fetcher = DictInfoFetcher(files, 'dict',
+                              cache_ttl=3600,
+                              cache_base_path=str(tmpdir),
+                              cache_data=False)
+    fetcher.get_file_data('foo.yml')
+    assert not tmpdir.join('dict.data').check()
+
+
+def test_git_fetch_without_worktree(tmpdir):
+    src_path = common.get_test_info_path('minimal')
+    url = common.create_git_repo(src_path, str(tmpdir.join('info.git')))
+    di = DistroInfo('minimal.yml',
+                    remote_git_info=url,
+                    cache_base_path=str(tmpdir.join('cache')),
+                    git_checkout=False)
+    info = di.get_info()
+    assert info == DistroInfo('minimal.yml', local_info=src_path).get_info()
+    assert not os.path.exists(di.fetcher.repo.get_file_path('minimal.yml'))
+    with pytest.raises(IOError):
+        di.fetcher.get_file_content('missing.yml')
+    with pytest.raises(IOError):
+        di.fetcher.get_file_content('missing file.yml')
+    # reader is still in sync after missing files
+    assert di.fetcher.get_file_content('minimal.yml')
+    di.fetcher.close()
+
+
+def test_git_fetch_revision(tmpdir):
+    url = common.create_git_repo(common.get_test_info_path('minimal'),
+                                 str(tmpdir.join('info.git')))
+    cache_path = str(tmpdir.join('cache'))
+
+    def get_releases(revision):
+        di = DistroInfo('minimal.yml',
+                        remote_git_info=url,
+                        cache_base_path=cache_path,
+                        cache_ttl=0,
+                        git_revision=revision)
+        info = di.get_info()
+        di.fetcher.close()
+        return [r['name'] for r in info['releases']]
+
+    assert get_releases('master') == ['rocky', 'queens']
+    work_path = url + '-work'
+    old_commit = helpers.git('rev-parse', 'HEAD', cwd=work_path).strip()
+    with open(os.path.join(work_path, 'releases.yml'), 'a') as f:
+        f.write('- name: stein\n  repos: []\n')
+    common.commit_git_repo(work_path)
+    common.push_git_repo(work_path)
+    assert get_releases('origin/master') == ['rocky', 'queens', 'stein']
+    # bare branch name isn't resolved to stale local branch
+    assert get_releases('master') == ['rocky', 'queens', 'stein']
+    # pinned commit is read from local clone without fetching
+    log_stream = common.capture_distroinfo_logger()
+    assert get_releases(old_commit) == ['rocky', 'queens']
+    assert 'Fetching git repo' not in log_stream.getvalue()
+
+
+@pytest.mark.parametrize('checkout', [True, False])
+def test_git_refresh_info(tmpdir, checkout):
+    url = common.create_git_repo(common.get_test_info_path('minimal'),
+                                 str(tmpdir.join('info.git')))
+    di = DistroInfo('minimal.yml',
+                    remote_git_info=url,
+                    cache_base_path=str(tmpdir.join('cache')),
+                    cache_ttl=0,
+                    git_checkout=checkout,
+                    result_cache_size=1)
+
+    def get_releases(info):
+        return [r['name'] for r in info['releases']]
+
+    info = di.refresh_info()
+    assert get_releases(info) == ['rocky', 'queens']
+    assert di.refresh_info() is info
+    assert get_releases(di.get_info()) == ['rocky', 'queens']
+    work_path = url + '-work'
+    with open(os.path.join(work_path, 'releases.yml'), 'a') as f:
+        f.write('- name: stein\n  repos: []\n')
+    common.commit_git_repo(work_path)
+    common.push_git_repo(work_path)
+    # new upstream commit is noticed by the same instance
+    assert get_releases(di.refresh_info()) == ['rocky', 'queens', 'stein']
+    assert get_releases(di.get_info()) == ['rocky', 'queens', 'stein']
+    di.fetcher.close()
+
+
+def test_git_fetch_shallow_partial_sparse(tmpdir):
+    src_path = common.get_test_info_path('rdoinfo')
+    path = common.create_git_repo(src_path, str(tmpdir.join('info.git')))
+    helpers.git('config', 'uploadpack.allowFilter', 'true', cwd=path)
+    url = 'file://' + path
+    di = DistroInfo('rdo.yml',
+                    remote_git_info=url,
+                    cache_base_path=str(tmpdir.join('cache')),
+                    git_clone_depth=1,
+                    git_clone_filter='blob:none',
+                    git_sparse=True)
+    info = di.get_info()
+    common.assert_rdoinfo_base(info)
+    repo = di.fetcher.repo
+    assert os.path.exists(os.path.join(repo.repo_path, '.git', 'shallow'))
+    assert os.path.exists(repo.get_file_path('tags/train.yml'))
+    assert not os.path.exists(repo.get_file_path('buildsys-tags'))
+    # following fetch keeps the sparse checkout
+    repo.fetch(force=True)
+    assert os.path.exists(repo.get_file_path('tags/train.yml'))
+    assert not os.path.exists(repo.get_file_path('buildsys-tags'))
+
+
+def test_write_file_atomic(tmpdir):
+    path = str(tmpdir.join('sub', 'foo.yml'))
+    helpers.write_file_atomic(path, u'foo: bar\n')
+    helpers.write_file_atomic(path, u'foo: baz\n')
+    assert open(path).read() == u'foo: baz\n'
+    helpers.write_file_atomic(path + '.pickle', b'\x80')
+    assert open(path + '.pickle', 'rb').read() == b'\x80'
+    # no temporary files are left behind
+    assert sorted(os.listdir(str(tmpdir.join('sub')))) == [
+        'foo.yml', 'foo.yml.pickle']
+
+
+def test_remote_fetch_single_refresh(tmpdir):
+    path = common.get_test_info_path('minimal')
+    with common.serve_directory(path) as server:
+        fetchers = [fetch.RemoteInfoFetcher(server.url,
+                                            cache_ttl=3600,
+                                            cache_base_path=str(tmpdir))
+                    for _ in range(8)]
+        threads = [threading.Thread(target=f.get_file_content,
+                                    args=('packages.yml',))
+                   for f in fetchers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # only one fetcher refreshed the file, others used it
+        assert server.requests == [('/packages.yml', 200)]
+
+
+def test_content_cache_shared(tmpdir, monkeypatch):
+    monkeypatch.setattr(fetch, 'content_cache', fetch.ContentCache())
+    path = str(tmpdir.join('minimal'))
+    shutil.copytree(common.get_test_info_path('minimal'), path)
+    loaded = []
+    orig_load_file_data = fetch.LocalInfoFetcher.load_file_data
+
+    def load_file_data(self, fn):
+        loaded.append(fn)
+        return orig_load_file_data(self, fn)
+
+    monkeypatch.setattr(fetch.LocalInfoFetcher, 'load_file_data',
+                        load_file_data)
+    info = DistroInfo('minimal.yml', local_info=path).get_info()
+    assert len(loaded) == 4
+    # other instances use data cached in memory
+    assert DistroInfo('minimal.yml', local_info=path).get_info() == info
+    assert len(loaded) == 4
+    # changed file is loaded again
+    with open(os.path.join(path, 'releases.yml'), 'a') as f:
+        f.write('- name: stein\n  repos: []\n')
+    DistroInfo('minimal.yml', local_info=path).get_info()
+    assert loaded[4:] == ['releases.yml']
+
+
+def test_content_cache_max_size():
+    cache = fetch.ContentCache(max_size=200)
+    cache.set('foo', 'x' * 80)
+    cache.set('bar', 'y' * 80)
+    assert cache.get('foo') == 'x' * 80
+    # least recently used entry is evicted to fit
+    cache.set('baz', 'z' * 80)
+    assert cache.get('bar') is None
+    assert cache.get('foo') == 'x' * 80
+    assert cache.size <= 200
+    # entries bigger than cache aren't stored at all
+    cache.set('big', 'b' * 300)
+    assert cache.get('big') is None
+    cache.clear()
+    assert cache.get('foo') is None
+    assert cache.size == 0
+
+
+def test_remote_fetch_stale_while_revalidate(tmpdir, monkeypatch):
+    path = str(tmpdir.join('served'))
+    shutil.copytree(common.get_test_info_path('minimal'), path)
+
+    def append_served_file(text, t_delta):
+        served_path = os.path.join(path, 'releases.yml')
+        with open(served_path, 'a') as f:
+            f.write(text)
+        # Last-Modified has 1 s resolution
+        t_mod = time.time() + t_delta
+        os.utime(served_path, (t_mod, t_mod))
+
+    with common.serve_directory(path) as server:
+        fetcher = fetch.RemoteInfoFetcher(server.url,
+                                          cache_ttl=60,
+                                          cache_max_age=3600,
+                                          cache_base_path=str(tmpdir))
+        old = fetcher.get_file_content('releases.yml')
+        append_served_file('# new\n', 10)
+        ages = {'age': 600}
+        monkeypatch.setattr(helpers, 'get_file_age',
+                            lambda path: ages['age'])
+        # stale file is returned right away and refreshed in background
+        assert fetcher.get_file_content('releases.yml') == old
+        fetcher.wait_for_refresh()
+        assert server.requests[-1] == ('/releases.yml', 200)
+        ages['age'] = 0
+        assert fetcher.get_file_content('releases.yml') == old + '# new\n'
+        # too old cache blocks until refreshed
+        append_served_file('# newer\n', 20)
+        ages['age'] = 7200
+        new = fetcher.get_file_content('releases.yml')
+        assert new == old + '# new\n# newer\n'
+
+
+@pytest.mark.parametrize('checkout', [False, True])
+def test_git_fetch_stale_while_revalidate(tmpdir, monkeypatch, checkout):
+    url = common.create_git_repo(common.get_test_info_path('minimal'),
+                                 str(tmpdir.join('info.git')))
+    cache_path = str(tmpdir.join('cache'))
+
+    def get_fetcher():
+        return fetch.RemoteGitInfoFetcher(url,
+                                          cache_ttl=60,
+                                          cache_max_age=3600,
+                                          cache_base_path=cache_path,
+                                          checkout=checkout)
+
+    fetcher = get_fetcher()
+    old_commit = fetcher.get_fingerprint([])
+    fetcher.close()
+    work_path = url + '-work'
+    with open(os.path.join(work_path, 'releases.yml'), 'a') as f:
+        f.write('# new\n')
+    common.commit_git_repo(work_path)
+    common.push_git_repo(work_path)
+    monkeypatch.setattr(fetcher.repo.__class__, 'get_last_fetch_time',
+                        lambda self: time.time() - 600)
+    fetcher = get_fetcher()
+    if checkout:
+        # worktree is never updated in background
+        assert fetcher.get_fingerprint([]) != old_commit
+        assert fetcher.get_file_content('releases.yml').endswith('# new\n')
+        fetcher.close()
+        return
+    # stale repo is used right away and fetched in background
+    assert fetcher.get_fingerprint([]) == old_commit
+    fetcher.wait_for_refresh()
+    fetcher.close()
+    monkeypatch.undo()
+    fetcher = get_fetcher()
+    assert fetcher.get_fingerprint([]) != old_commit
+    assert fetcher.get_file_content('releases.yml').endswith('# new\n')
+    fetcher.close()
+
+
+def test_iter_yaml_items():
+    content = ('package-default: &default {name: foo}\n'
+               'packages:\n'
+               '- project: a\n'
+               '- *default\n'
+               'components: [x]\n')
+    items = list(fetch.iter_yaml_items(six.StringIO(content)))
+    assert items == [
+        ('package-default', {'name': 'foo'}),
+        ('packages', {'project': 'a'}),
+        ('packages', {'name': 'foo'}),
+        ('components', ['x']),
+    ]
+    assert list(fetch.iter_yaml_items(six.StringIO(content),
+                                      stream_key='components')) == [
+        ('package-default', {'name': 'foo'}),
+        ('packages', [{'project': 'a'}, {'name': 'foo'}]),
+        ('components', 'x'),
+    ]
+    items = fetch.iter_yaml_items(six.StringIO('packages: {a: {b: 1}}\n'))
+    assert list(items) == [('packages', {'b': 1})]
+    assert list(fetch.iter_yaml_items(six.StringIO(''))) == []
+    with pytest.raises(exception.InvalidInfoFormat):
+        list(fetch.iter_yaml_items(six.StringIO('packages: 1\n')))
+    with pytest.raises(exception.InvalidInfoFormat):
+        list(fetch.iter_yaml_items(six.StringIO('- a\n')))
@@ -0,0 +1,264 @@
+import copy
+import pytest
+
+from distroinfo import exception
+from distroinfo import parse
+
+
+def get_raw_info():
+    return {
+        'releases': [
+            {'name': 'train', 'branch': 'train-rdo',
+             'repos': [{'name': 'el8'}]},
+        ],
+        'package-default': {
+            'name': 'python-%(project)s',
+            'maintainers': ['foo@example.com'],
+        },
+        'package-configs': {
+            'core': {'name': 'openstack-%(project)s'},
+        },
+        'packages': [
+            {'project': 'nova', 'conf': 'core'},
+            {'project': 'novaclient'},
+            {'project': 'oslo-config', 'name': 'python-oslo-config'},
+        ],
+    }
+
+
+def test_parse_info():
+    info = parse.parse_info(get_raw_info())
+    names = [pkg['name'] for pkg in info['packages']]
+    assert names == ['openstack-nova', 'python-novaclient',
+                     'python-oslo-config']
+    assert info['releases'][0]['repos'][0]['branch'] == 'train-rdo'
+
+
+def test_duplicated_project():
+    raw_info = get_raw_info()
+    raw_info['packages'].append({'project': 'nova'})
+    with pytest.raises(exception.DuplicatedProject):
+        parse.parse_info(raw_info)
+
+
+def test_duplicated_name():
+    raw_info = get_raw_info()
+    raw_info['packages'].append({'project': 'nova-dup',
+                                 'name': 'openstack-nova'})
+    # duplicate names are allowed by default
+    parse.parse_info(copy.deepcopy(raw_info))
+    with pytest.raises(exception.DuplicatedPackage):
+        parse.parse_info(raw_info, unique_names=True)
+
+
+def test_collect_errors():
+    raw_info = get_raw_info()
+    raw_info['releases'].append({'name': 'ussuri'})
+    raw_info['packages'] += [
+        {'project': 'nova'},
+        {'project': 'glance', 'maintainers': []},
+        {'project': 'cinder', 'conf': 'nope'},
+    ]
+    # first error is raised by default
+    with pytest.raises(exception.MissingRequiredItem):
+        parse.parse_info(copy.deepcopy(raw_info))
+    with pytest.raises(exception.InfoValidationFailed) as excinfo:
+        parse.parse_info(raw_info, collect_errors=True)
+    errors = excinfo.value.errors
+    assert [type(e) for e in errors] == [
+        exception.MissingRequiredItem,
+        exception.DuplicatedProject,
+        exception.MissingRequiredItem,
+        exception.UndefinedPackageConfig,
+    ]
+    assert '4 error(s)' in str(excinfo.value)
+    assert 'Duplicated project: nova' in str(excinfo.value)
+
+
+def test_collect_errors_missing_sections():
+    with pytest.raises(exception.InfoValidationFailed) as excinfo:
+        parse.parse_info({}, collect_errors=True)
+    assert [e.kwargs['section'] for e in excinfo.value.errors] == [
+        'releases', 'packages']
+
+
+def test_parse_package_shares_layers():
+    raw_info = get_raw_info()
+    raw_info['package-default']['tags'] = {'train': None}
+    raw_info['packages'].append({'project': 'glance',
+                                 'maintainers': ['bar@example.com']})
+    info = parse.parse_info(raw_info)
+    pkgs = info['packages']
+    # inherited values are shared, not copied for each package
+    assert pkgs[0]['maintainers'] is pkgs[1]['maintainers']
+    assert pkgs[0]['tags'] is pkgs[2]['tags']
+    # overridden values only affect the package
+    assert pkgs[3]['maintainers'] == ['bar@example.com']
+    assert pkgs[0]['maintainers'] == ['foo@example.com']
+    # substitution uses values before substitution, as before
+    assert pkgs[3]['name'] == 'python-glance'
+    assert type(pkgs[0]) is dict
+
+
+def test_parse_package_apply_tag():
+    raw_info = get_raw_info()
+    raw_info['packages'][1]['tags'] = {
+        'train': {'source-branch': '%(project)s-stable'}}
+    info = parse.parse_info(raw_info, apply_tag='train')
+    pkg = info['packages'][1]
+    assert pkg['source-branch'] == 'novaclient-stable'
+    assert 'source-branch' not in info['packages'][0]
+
+
+def test_lazy_packages():
+    raw_info = get_raw_info()
+    raw_info['packages'].append({'project': 'glance', 'maintainers': []})
+    info = parse.parse_info(raw_info, lazy=True)
+    pkgs = info['packages']
+    assert pkgs[0]['name'] == 'openstack-nova'
+    assert pkgs[-2]['name'] == 'python-oslo-config'
+    assert pkgs.get_package('python-novaclient') is pkgs[1]
+    assert pkgs.get_package('python-nova') is None
+    # invalid package only fails when accessed or validated
+    with pytest.raises(exception.MissingRequiredItem):
+        pkgs[3]
+    with pytest.raises(exception.InfoValidationFailed) as exc:
+        pkgs.validate(collect_errors=True)
+    assert len(exc.value.errors) == 1
+
+
+def test_lazy_packages_duplicates():
+    raw_info = get_raw_info()
+    raw_info['packages'].append({'project': 'nova'})
+    info = parse.parse_info(raw_info, lazy=True)
+    assert info['packages'][3]['name'] == 'python-nova'
+    with pytest.raises(exception.DuplicatedProject):
+        info['packages'].validate()
+
+
+@pytest.mark.parametrize('txt', [
+    'no placeholders',
+    'openstack-%(project)s',
+    '%(project)s-%(version)s',
+    '100%% %(project)s %%(name)s',
+    '%(version)d',
+])
+def test_compile_template(txt):
+    pkg = {'project': 'nova', 'version': 3}
+    assert parse.compile_template(txt)(pkg) == txt % pkg
+
+
+def test_substitute_package():
+    templates = {}
+    pkg = {'project': 'nova', 'name': 'openstack-%(project)s',
+           'url': 'https://example.com/nova', 'maintainers': []}
+    subst_pkg = parse.substitute_package(pkg, templates=templates)
+    assert subst_pkg == dict(pkg, name='openstack-nova')
+    # only templates are compiled
+    assert list(templates) == ['openstack-%(project)s']
+    pkg['url'] = 'https://example.com/%(upstream)s'
+    with pytest.raises(exception.SubstitutionFailed):
+        parse.substitute_package(pkg, templates=templates)
+
+
+def test_parse_info_tags_duplicates():
+    raw_info = get_raw_info()
+    raw_info['packages'][1]['tags'] = {'train': {'project': 'nova'}}
+    tag_infos = parse.parse_info_tags(copy.deepcopy(raw_info),
+                                      tags=['ussuri'])
+    assert tag_infos['ussuri']['packages'][1]['project'] == 'novaclient'
+    with pytest.raises(exception.DuplicatedProject):
+        parse.parse_info_tags(raw_info)
+
+
+def test_parse_info_tags_valid_with_tag_only():
+    raw_info = get_raw_info()
+    del raw_info['package-default']['maintainers']
+    for pkg in raw_info['packages']:
+        pkg['maintainers'] = ['foo@example.com']
+    raw_info['packages'].append({
+        'project': 'glance',
+        'tags': {'train': {'maintainers': ['glance@example.com']},
+                 'ussuri': None},
+    })
+    # duplicate project which is renamed by tag
+    raw_info['packages'].append({
+        'project': 'nova',
+        'maintainers': ['foo@example.com'],
+        'tags': {'train': {'project': 'nova-train'}},
+    })
+    tag_infos = parse.parse_info_tags(copy.deepcopy(raw_info),
+                                      tags=['train'])
+    train_info = parse.parse_info(copy.deepcopy(raw_info), apply_tag='train')
+    assert tag_infos['train'] == train_info
+    assert tag_infos['train']['packages'][3]['maintainers'] == [
+        'glance@example.com']
+    # errors remaining with a tag applied are still raised
+    with pytest.raises(exception.MissingRequiredItem):
+        parse.parse_info_tags(copy.deepcopy(raw_info))
+    with pytest.raises(exception.InfoValidationFailed) as exc:
+        parse.parse_info_tags(copy.deepcopy(raw_info), tags=['ussuri'],
+                              collect_errors=True)
+    assert [type(e) for e in exc.value.errors] == [
+        exception.MissingRequiredItem, exception.DuplicatedProject]
+
+
+def test_merger():
+    infos = [
+        {'a': {'x': [1], 'y': {'z': 1}}, 'b': 'b1', 'c': None},
+        {'a': {'x': [2], 'y': None}, 'b': None, 'c': {'d': 1}},
+        {'a': {'x': [3], 'y': {'w': 2}}, 'b': {'e': []}, 'c': {'d': 2}},
+        {'a': 'overridden', 'b': {'e': [1]}, 'f': [1]},
+    ]
+    orig_infos = copy.deepcopy(infos)
+    expected = infos[0]
+    for info in infos[1:]:
+        expected = parse._merge(expected, info)
+    merger = parse.Merger()
+    result = infos[0]
+    for info in infos[1:]:
+        result = merger.merge(result, info)
+    assert result == expected
+    # merged data isn't modified
+    assert infos == orig_infos
+    # data without need to merge is shared
+    assert result['f'] is infos[3]['f']
+
+
+def test_merge_infos():
+    raw_info = get_raw_info()
+    overlay = {'packages': [{'project': 'nova', 'tags': {'train': None}},
+                            {'project': 'glance', 'name': 'glance'}]}
+    orig_overlay = copy.deepcopy(overlay)
+    info = parse.merge_infos(raw_info, overlay, in_place=False)
+    assert [p['project'] for p in info['packages']] == [
+        'nova', 'novaclient', 'oslo-config', 'glance']
+    assert info['packages'][0] == {'project': 'nova', 'conf': 'core',
+                                   'tags': {'train': None}}
+    assert overlay == orig_overlay
+    assert raw_info == get_raw_info()
+
+
+def test_merge_infos_overlay():
+    raw_info = get_raw_info()
+    overlays = [
+        {'packages': [{'project': 'nova', 'buildsys-tags': {'a': 'nova-1'}},
+                      {'project': 'novaclient',
+                       'buildsys-tags': {'a': 'novaclient-1'}}]},
+        {'packages': [{'project': 'nova', 'buildsys-tags': {'b': 'nova-2'}},
+                      {'project': 'glance', 'buildsys-tags': None}]},
+        # duplicates aren't merged using overlay fast path
+        {'packages': [{'project': 'nova', 'buildsys-tags': {'a': None}},
+                      {'project': 'nova', 'buildsys-tags': {'c': 'x'}}]},
+    ]
+    assert all(parse._is_packages_overlay(o) for o in overlays[:2])
+    assert not parse._is_packages_overlay(overlays[2])
+    orig_overlays = copy.deepcopy(overlays)
+    info = parse.merge_infos(raw_info, *overlays, in_place=False)
+    expected = parse.info2dicts(get_raw_info())
+    for overlay in orig_overlays:
+        expected = parse._merge(expected, parse.info2dicts(overlay))
+    assert info == parse.info2lists(expected)
+    assert info['packages'][0]['buildsys-tags'] == {
+        'a': 'nova-1', 'b': 'nova-2', 'c': 'x'}
+    assert overlays == orig_overlays
@@ -1,7 +1,9 @@
 import copy
+import pytest
 import six
 import unittest
 from distroinfo.info import DistroInfo
+from distroinfo import exception
 from distroinfo import query
 
 import tests.test_common as common
@@ -167,3 +169,100 @@ def test_exclusion_filter_found():
     assert (isinstance(finding, list))
     assert (len(finding) == 1)
     assert ("newton" not in finding[0]["tags"])
+
+
+def test_filter_pkgs_compiled():
+    pkgs = [
+        {'name': 'python-nova', 'tags': {'train': None, 'ussuri': None},
+         'maintainers': ['a@redhat.com', 'b@example.com']},
+        {'name': 'python-novaclient', 'tags': {'ussuri-uc': None},
+         'maintainers': ['c@example.com']},
+        {'name': 'openstack-nova.spec', 'tags': {}},
+    ]
+    assert query.filter_pkgs(pkgs, {'name': 'nova.'}) == pkgs[1:]
+    assert query.filter_pkgs(pkgs, {'name': r'nova\.'}) == pkgs[2:]
+    assert query.filter_pkgs(pkgs, {'tags': '^ussuri$'}) == pkgs[:1]
+    assert query.filter_pkgs(pkgs, {'tags': 'ussuri'}) == pkgs[:2]
+    assert query.filter_pkgs(pkgs, {'tags': '~ussuri$'}) == pkgs[1:]
+    assert query.filter_pkgs(
+        pkgs, {'maintainers': r'@example\.com$', 'name': '~client'},
+    ) == pkgs[:1]
+    assert (query.compile_filter({'name': 'nova'})
+            is query.compile_filter({'name': 'nova'}))
+
+
+def test_filter_pkgs_invalid():
+    pkgs = [{'name': 'foo', 'weight': 3}]
+    with pytest.raises(exception.InvalidPackageFilter):
+        query.filter_pkgs(pkgs, {'weight': '3'})
+
+
+def test_info_index_same_results():
+    di = DistroInfo('rdo-full.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    info = di.get_info()
+    index = query.InfoIndex(info)
+    needles = ['nova', 'NOVA', 'openstack-nova', 'python-novaclient',
+               'git://git.openstack.org/openstack/nova.git',
+               'https://github.com/rdo-packages/nova-distgit',
+               'https://example.com/foo/oslo.config', 'oslo', 'Client',
+               'no-such-package', 'git://example.com/nope.git']
+    for pkg in info['packages'][::20]:
+        needles += [pkg['name'], pkg['project'], pkg.get('upstream', '')]
+    for needle in needles:
+        for strict in (False, True):
+            assert (query.find_package(index, needle, strict=strict)
+                    is query.find_package(info, needle, strict=strict))
+        assert (query.get_package(index, needle)
+                is query.get_package(info, needle))
+    for rls in info['releases'] + [{'name': 'nope'}]:
+        assert (query.get_release(index, rls['name'])
+                is query.get_release(info, rls['name']))
+    assert index['packages'] is info['packages']
+    assert query.get_distrepos(index, 'train') == query.get_distrepos(
+        info, 'train')
+
+
+def test_tags_diff():
+    di = DistroInfo('rdo.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    info = di.get_info()
+    info2 = copy.deepcopy(info)
+    for pkg in info2['packages']:
+        if pkg['project'] == 'nova':
+            pkg['tags']['zed'] = None
+        elif pkg['project'] == 'glance':
+            pkg['upstream'] = 'https://opendev.org/openstack/foo'
+    info2['packages'].append({'project': 'newproject',
+                              'name': 'openstack-newproject',
+                              'tags': {'zed': None}})
+    diff = query.tags_diff(info, info2)
+    assert diff == [('openstack-nova', ['zed']),
+                    ('openstack-newproject', ['zed'])]
+    assert query.tags_diff(info, info) == []
+
+
+def test_info_index_best_effort():
+    di = DistroInfo('rdo-full.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    info = di.get_info()
+    index = query.InfoIndex(info)
+    needles = ['', 'a', 'ov', 'zz-nova', 'git://foo/bar']
+    for pkg in info['packages'][::7]:
+        name = pkg['name']
+        needles += [name[1:], name[3:-3].upper(), name[:2],
+                    'https://example.com/x/%s-foo' % pkg['project']]
+    for needle in needles:
+        assert (query.find_package(index, needle)
+                is query.find_package(info, needle))
+
+
+def test_info_index_search_packages():
+    pkgs = [{'name': 'python-novaclient', 'project': 'novaclient'},
+            {'name': 'nova-tests', 'project': 'nova-tests'},
+            {'name': 'nova', 'project': 'nova'},
+            {'name': 'openstack-glance', 'project': 'glance'}]
+    index = query.InfoIndex({'packages': pkgs, 'releases': []})
+    assert index.search_packages('NOVA') == [pkgs[2], pkgs[1], pkgs[0]]
+    assert index.search_packages('nova', limit=1) == [pkgs[2]]
+    assert index.search_packages('cinder') == []
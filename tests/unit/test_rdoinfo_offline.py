@@ -1,5 +1,12 @@
 from distroinfo.info import DistroInfo
+from distroinfo import exception
+from distroinfo import helpers
 from distroinfo import parse
+from distroinfo import query
+import os
+import pytest
+import shutil
+import yaml
 
 import tests.test_common as common
 
@@ -32,3 +39,179 @@ def test_dict_conversion():
     info_dicts = di.get_info(info_dicts=True)
     assert parse.info2dicts(info) == info_dicts
     assert parse.info2lists(info_dicts) == info
+
+
+def test_rdoinfo_lazy():
+    di = DistroInfo('rdo-full.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    info = di.get_info()
+    lazy_info = di.get_info(lazy=True)
+    pkgs = lazy_info['packages']
+    assert isinstance(pkgs, parse.LazyPackages)
+    assert len(pkgs) == len(info['packages'])
+    pkg = query.get_package(lazy_info, 'openstack-nova')
+    assert pkg == query.get_package(info, 'openstack-nova')
+    # only accessed package was resolved
+    assert len(pkgs.packages) == 1
+    assert pkgs == info['packages']
+    pkgs.validate()
+    assert pkgs[5] == info['packages'][5]
+    assert pkgs == info['packages']
+    dict_pkgs = di.get_info(info_dicts=True)['packages']
+    lazy_dicts = di.get_info(info_dicts=True, lazy=True)
+    assert lazy_dicts['packages'] == dict_pkgs
+    lazy_pkgs = di.get_info(info_dicts=True, lazy=True)['packages']
+    lazy_pkgs.validate()
+    assert isinstance(lazy_pkgs['puppet-aodh'], dict)
+    assert lazy_pkgs['puppet-aodh'] == dict_pkgs['puppet-aodh']
+    assert dict(lazy_pkgs) == dict_pkgs
+
+
+def test_rdoinfo_tag_infos():
+    di = DistroInfo('rdo-full.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    tags = ['train', 'ussuri', 'dependency']
+    tag_infos = di.get_tag_infos(tags=tags)
+    assert list(tag_infos) == tags
+    for tag in tags:
+        assert tag_infos[tag] == di.get_info(apply_tag=tag)
+    # packages without overrides are shared
+    train_pkgs = tag_infos['train']['packages']
+    ussuri_pkgs = tag_infos['ussuri']['packages']
+    assert any(p1 is p2 for p1, p2 in zip(train_pkgs, ussuri_pkgs))
+    assert 'victoria' in di.get_tag_infos()
+
+
+def test_rdoinfo_tag_infos_dicts():
+    di = DistroInfo('rdo-full.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    tag_infos = di.get_tag_infos(tags=['train'], info_dicts=True)
+    assert tag_infos['train'] == di.get_info(apply_tag='train',
+                                             info_dicts=True)
+
+
+def test_rdoinfo_refresh(tmpdir):
+    path = str(tmpdir.join('rdoinfo'))
+    shutil.copytree(common.get_test_info_path('rdoinfo'), path)
+    di = DistroInfo('rdo-full.yml', local_info=path)
+    info = di.refresh_info()
+    assert info == di.get_info()
+    assert di.refresh_info() is info
+    tag_fn = os.path.join(path, 'buildsys-tags',
+                          'cloud7-openstack-train-testing.yml')
+    with open(tag_fn, 'a') as f:
+        f.write('- project: nova\n'
+                '  buildsys-tags:\n'
+                '    cloud7-openstack-ussuri-testing: openstack-nova-1\n'
+                '- project: new-project\n'
+                '  name: python-new-project\n'
+                '  maintainers: [foo@example.com]\n')
+    # make sure mtime changes
+    os.utime(tag_fn, ns=(0, 0))
+    new_info = di.refresh_info()
+    assert new_info == di.get_info()
+    assert new_info['packages'][-1]['project'] == 'new-project'
+    nova = query.get_package(new_info, 'openstack-nova')
+    assert nova['buildsys-tags']['cloud7-openstack-ussuri-testing'] == (
+        'openstack-nova-1')
+    # unaffected packages were neither merged nor parsed again
+    name = 'openstack-swift-plugin-swift3'
+    swift3 = query.get_package(new_info, name)
+    assert swift3 and swift3 is query.get_package(info, name)
+    assert nova is not query.get_package(info, 'openstack-nova')
+    # changed arguments start over
+    tag_info = di.refresh_info(apply_tag='train')
+    assert tag_info == di.get_info(apply_tag='train')
+
+
+def test_rdoinfo_refresh_invalid_file(tmpdir):
+    path = str(tmpdir.join('rdoinfo'))
+    shutil.copytree(common.get_test_info_path('rdoinfo'), path)
+    di = DistroInfo('rdo-full.yml', local_info=path)
+    info = di.refresh_info()
+    tag_fn = os.path.join(path, 'buildsys-tags',
+                          'cloud7-openstack-train-testing.yml')
+    with open(tag_fn) as f:
+        content = f.read()
+    with open(tag_fn, 'a') as f:
+        f.write('- project: [nova\n')
+    os.utime(tag_fn, ns=(0, 0))
+    # broken file is loaded again until it's fixed
+    for _ in range(2):
+        with pytest.raises(yaml.YAMLError):
+            di.refresh_info()
+    with open(tag_fn, 'w') as f:
+        f.write(content)
+    os.utime(tag_fn, ns=(1, 1))
+    assert di.refresh_info() == info
+
+
+def test_rdoinfo_iter_packages():
+    di = DistroInfo('rdo.yml',
+                    local_info=common.get_test_info_path('rdoinfo'))
+    # only packages of the info file itself, without imports
+    raw_info = di.fetcher.get_file_data('rdo.yml')
+    info = parse.parse_info(raw_info, apply_tag='train')
+    pkgs = di.iter_packages(apply_tag='train')
+    assert not isinstance(pkgs, list)
+    assert list(pkgs) == info['packages']
+
+
+def test_iter_packages_default_after_packages(tmpdir):
+    tmpdir.join('info.yml').write(
+        "packages:\n"
+        "- project: nova\n"
+        "  name: openstack-nova\n"
+        "  maintainers: [foo@example.com]\n"
+        "package-configs:\n"
+        "  core:\n"
+        "    distgit: core-%(project)s\n")
+    di = DistroInfo('info.yml', local_info=str(tmpdir))
+    pkgs = di.iter_packages()
+    assert next(pkgs)['project'] == 'nova'
+    with pytest.raises(exception.InvalidInfoFormat) as exc:
+        next(pkgs)
+    assert 'package-configs' in str(exc.value)
+
+
+def test_rdoinfo_diff_revisions(tmpdir):
+    url = common.create_git_repo(common.get_test_info_path('rdoinfo'),
+                                 str(tmpdir.join('rdoinfo.git')))
+    work_path = url + '-work'
+    old_commit = helpers.git('rev-parse', 'HEAD', cwd=work_path).strip()
+    tag_fn = os.path.join(work_path, 'buildsys-tags',
+                          'cloud7-openstack-train-testing.yml')
+    with open(tag_fn, 'a') as f:
+        f.write('- project: nova\n'
+                '  buildsys-tags:\n'
+                '    cloud7-openstack-ussuri-testing: openstack-nova-1\n'
+                '- project: new-project\n'
+                '  name: python-new-project\n'
+                '  maintainers: [foo@example.com]\n')
+    common.commit_git_repo(work_path)
+    common.push_git_repo(work_path)
+    di = DistroInfo('rdo-full.yml',
+                    remote_git_info=url,
+                    cache_base_path=str(tmpdir.join('cache')))
+    old_info, new_info = di.get_revision_infos([old_commit, 'origin/master'])
+    local_info = DistroInfo('rdo-full.yml', local_info=work_path).get_info()
+    assert new_info == local_info
+    assert old_info != new_info
+    # unaffected packages are shared between revisions
+    name = 'openstack-swift-plugin-swift3'
+    swift3 = query.get_package(new_info, name)
+    assert swift3 and swift3 is query.get_package(old_info, name)
+
+    diff = di.diff_revisions(old_commit, 'origin/master')
+    assert diff == {
+        'packages': {
+            'added': ['python-new-project'],
+            'removed': [],
+            'changed': [('openstack-nova', ['buildsys-tags'])],
+        },
+        'releases': {'added': [], 'removed': [], 'changed': []},
+    }
+    assert di.diff_revisions(old_commit, old_commit) == {
+        'packages': {'added': [], 'removed': [], 'changed': []},
+        'releases': {'added': [], 'removed': [], 'changed': []},
+    }
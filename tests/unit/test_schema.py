@@ -0,0 +1,143 @@
+import pytest
+
+from distroinfo import exception
+from distroinfo import info
+from distroinfo import schema
+
+from tests import test_common as common
+
+
+def get_files():
+    return [
+        ('base.yml', {
+            'releases': [
+                {'name': 'train', 'branch': 'train-rdo',
+                 'repos': [{'name': 'el8'}]},
+            ],
+            'package-default': {
+                'name': 'python-%(project)s',
+                'maintainers': ['foo@example.com'],
+            },
+            'packages': [
+                {'project': 'nova'},
+            ],
+        }),
+        ('overlay.yml', {
+            'packages': [
+                {'project': 'nova', 'tags': {'train': None}},
+                {'project': 'glance'},
+            ],
+        }),
+    ]
+
+
+def get_errors(files, **kwargs):
+    errors = schema.InfoSchema(**kwargs).validate(files)
+    return sorted(str(e) for e in errors)
+
+
+def test_schema_valid():
+    assert get_errors(get_files()) == []
+
+
+def test_schema_file_violations():
+    files = get_files()
+    base = files[0][1]
+    base['releases'][0]['repos'].append({'branch': 'train'})
+    base['packages'].append({'name': 'foo', 'maintainers': 'foo@bar'})
+    files[1][1]['packages'][1]['maintainers'] = ['nobody']
+    files[1][1]['tags'] = ['train']
+    assert get_errors(files) == [
+        "base.yml: packages[1].maintainers: expected list, got str",
+        "base.yml: packages[1].project: required item missing",
+        "base.yml: releases[train].repos[1].name: required item missing",
+        "overlay.yml: packages[glance].maintainers[0]: "
+        "'nobody' doesn't look like an email",
+    ]
+
+
+def test_schema_merged_violations():
+    files = get_files()
+    base = files[0][1]
+    del base['releases'][0]['branch']
+    del base['package-default']['maintainers']
+    files[1][1]['packages'][0]['maintainers'] = ['nova@example.com']
+    files[1][1]['packages'][1]['name'] = '%(nope)s'
+    assert get_errors(files) == [
+        "base.yml: releases[train].repos[el8].branch: "
+        "required item missing and release has no branch",
+        "overlay.yml: packages[glance]: "
+        "Substitution failed for string: %(nope)s",
+    ]
+
+
+def test_schema_file_and_merged_violations():
+    files = get_files()
+    files[0][1]['packages'].append('bogus')
+    files[1][1]['package-configs'] = ['not-a-mapping']
+    files[1][1]['packages'][1]['name'] = '%(project)'
+    files[1][1]['packages'].append({'project': 'keystone',
+                                    'name': '%(project)s%z'})
+    assert get_errors(files) == [
+        "base.yml: packages[1]: expected mapping, got str",
+        "overlay.yml: package-configs: expected mapping, got list",
+        "overlay.yml: packages[glance]: incomplete format",
+        "overlay.yml: packages[keystone]: "
+        "not enough arguments for format string",
+    ]
+
+
+def test_schema_missing_maintainers():
+    files = get_files()[:1]
+    del files[0][1]['package-default']['maintainers']
+    assert get_errors(files) == [
+        "base.yml: packages[nova].maintainers: required item missing",
+    ]
+
+
+def test_schema_custom_section():
+    files = get_files()
+    files[1][1]['components'] = [{'name': 'compute'}, {'owner': 'foo'}]
+    sections = {
+        'components': schema.List(schema.Dict({
+            'name': schema.Str(),
+            'owner': schema.Email(),
+        }, required=['name']), label='name'),
+    }
+    assert get_errors(files, sections=sections) == [
+        "overlay.yml: components[1].name: required item missing",
+        "overlay.yml: components[1].owner: "
+        "'foo' doesn't look like an email",
+    ]
+
+
+def test_schema_extra_sections():
+    files = get_files()
+    files[1][1]['bogus'] = True
+    assert get_errors(files) == []
+    assert get_errors(files, extra_sections=False) == [
+        "overlay.yml: bogus: unexpected item",
+    ]
+
+
+def test_rdoinfo_validate():
+    di = info.DistroInfo('rdo-full.yml',
+                         local_info=common.get_test_info_path('rdoinfo'))
+    di.validate()
+    di.validate(apply_tag='train-uc')
+
+
+def test_validate_raises(tmpdir):
+    tmpdir.join('info.yml').write(
+        "releases: []\n"
+        "packages:\n"
+        "- project: nova\n"
+        "- name: glance\n")
+    di = info.DistroInfo('info.yml', local_info=str(tmpdir))
+    with pytest.raises(exception.InfoValidationFailed) as exc:
+        di.validate()
+    assert [str(e) for e in exc.value.errors] == [
+        "info.yml: packages[1].project: required item missing",
+        "info.yml: packages[nova].name: required item missing",
+        "info.yml: packages[nova].maintainers: required item missing",
+    ]